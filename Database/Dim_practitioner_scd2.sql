@@ -0,0 +1,153 @@
+-- Migration: set-based SCD type 2 maintenance of model.Dim_Practitioner from planning1.practitioner
+-- Run once after Create.sql and tables.sql. The initial load runs at the end of this script.
+
+-- Connect to the database
+\c dashboard;
+
+BEGIN;
+
+-- Versions of the same practitioner share an email, so it can only be unique among current rows,
+-- and practitioners created from the roster have no email yet
+ALTER TABLE model.Dim_Practitioner DROP CONSTRAINT IF EXISTS dim_practitioner_email_key;
+ALTER TABLE model.Dim_Practitioner ALTER COLUMN email DROP NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS dim_practitioner_current_email_idx
+    ON model.Dim_Practitioner (email) WHERE is_current;
+
+-- Hash of the tracked attributes, used to detect changes in one comparison
+ALTER TABLE model.Dim_Practitioner ADD COLUMN IF NOT EXISTS attribute_hash CHAR(32);
+UPDATE model.Dim_Practitioner
+SET attribute_hash = md5(ROW(practitioner_name, contract_type, manager_name, location_name)::TEXT)
+WHERE attribute_hash IS NULL;
+
+CREATE INDEX IF NOT EXISTS dim_practitioner_current_idx
+    ON model.Dim_Practitioner (practitioner_id) WHERE is_current;
+
+-- A practitioner's first version covers all of their history, so facts for dates before the
+-- roster was first synced still resolve to a version (repairs first versions loaded as of their sync day)
+UPDATE model.Dim_Practitioner AS d
+SET effective_start_date = '1900-01-01'
+WHERE d.effective_start_date IS DISTINCT FROM '1900-01-01'
+  AND NOT EXISTS (
+      SELECT 1 FROM model.Dim_Practitioner AS e
+      WHERE e.practitioner_id = d.practitioner_id
+        AND (e.effective_start_date < d.effective_start_date
+             OR (e.effective_start_date = d.effective_start_date AND e.practitioner_dim_id < d.practitioner_dim_id))
+  );
+
+-- Versions are half-open: a version is effective from effective_start_date up to, but not including,
+-- effective_end_date (NULL while current), so a closed version ends on the day its successor starts and
+-- every practitioner has exactly one version on any date. Closed versions from earlier syncs ended the
+-- day before their successor; move those ends onto the successor's start.
+UPDATE model.Dim_Practitioner AS d
+SET effective_end_date = (
+    SELECT min(n.effective_start_date) FROM model.Dim_Practitioner AS n
+    WHERE n.practitioner_id = d.practitioner_id AND n.practitioner_dim_id > d.practitioner_dim_id
+)
+WHERE NOT d.is_current
+  AND EXISTS (
+      SELECT 1 FROM model.Dim_Practitioner AS n
+      WHERE n.practitioner_id = d.practitioner_id AND n.practitioner_dim_id > d.practitioner_dim_id
+  );
+
+-- Close changed or removed practitioners and insert new versions for changed or new ones.
+-- New versions start at as_of (never before the end of an existing version), except a practitioner's
+-- first version, which starts at 1900-01-01 so that it covers all earlier targets and facts.
+-- Returns (new practitioners, changed practitioners, removed practitioners).
+CREATE OR REPLACE FUNCTION model.sync_dim_practitioner(
+    as_of DATE DEFAULT current_date,
+    OUT practitioners_added INTEGER,
+    OUT practitioners_changed INTEGER,
+    OUT practitioners_removed INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Source rows shaped like the dimension, with the same attribute hash
+    CREATE TEMP TABLE practitioner_source ON COMMIT DROP AS
+    SELECT s.*, md5(ROW(s.practitioner_name, s.contract_type, s.manager_name, s.location_name)::TEXT) AS attribute_hash
+    FROM (
+        SELECT
+            p.practitioner_id,
+            left(COALESCE(p.practitioner_name, ''), 100)::VARCHAR(100) AS practitioner_name,
+            left(p.employee_type, 50)::VARCHAR(50) AS contract_type,
+            left(p.manager_name, 100)::VARCHAR(100) AS manager_name,
+            (SELECT min(l.location_id) FROM model.Dim_Location AS l WHERE l.location_name = p.clinic_location) AS location_id,
+            left(p.clinic_location, 100)::VARCHAR(100) AS location_name
+        FROM planning1.practitioner AS p
+    ) AS s;
+
+    -- Every practitioner whose current version is missing, different or no longer in the roster
+    CREATE TEMP TABLE practitioner_changes ON COMMIT DROP AS
+    SELECT
+        COALESCE(s.practitioner_id, d.practitioner_id) AS practitioner_id,
+        d.practitioner_dim_id AS current_dim_id,
+        d.email,
+        s.practitioner_id IS NOT NULL AS in_source,
+        CASE
+            WHEN h.latest_date IS NULL THEN '1900-01-01'::DATE
+            ELSE GREATEST(as_of, h.latest_date)
+        END AS effective_from
+    FROM practitioner_source AS s
+    FULL JOIN (
+        SELECT * FROM model.Dim_Practitioner WHERE is_current
+    ) AS d ON d.practitioner_id = s.practitioner_id
+    -- Latest start or end date among the practitioner's versions (NULL when they have none)
+    LEFT JOIN LATERAL (
+        SELECT max(COALESCE(v.effective_end_date, v.effective_start_date)) AS latest_date
+        FROM model.Dim_Practitioner AS v
+        WHERE v.practitioner_id = COALESCE(s.practitioner_id, d.practitioner_id)
+    ) AS h ON true
+    WHERE d.practitioner_dim_id IS NULL
+       OR s.practitioner_id IS NULL
+       OR d.attribute_hash IS DISTINCT FROM s.attribute_hash;
+
+    SELECT
+        count(*) FILTER (WHERE current_dim_id IS NULL),
+        count(*) FILTER (WHERE current_dim_id IS NOT NULL AND in_source),
+        count(*) FILTER (WHERE NOT in_source)
+    INTO practitioners_added, practitioners_changed, practitioners_removed
+    FROM practitioner_changes;
+
+    -- Close the current versions first so the new current rows can reuse their email;
+    -- each closed version ends where its successor starts
+    UPDATE model.Dim_Practitioner AS d
+    SET is_current = false,
+        effective_end_date = c.effective_from
+    FROM practitioner_changes AS c
+    WHERE d.practitioner_dim_id = c.current_dim_id;
+
+    INSERT INTO model.Dim_Practitioner (
+        practitioner_id, practitioner_name, email, contract_type, manager_name,
+        location_id, location_name, effective_start_date, effective_end_date, is_current, attribute_hash
+    )
+    SELECT
+        s.practitioner_id, s.practitioner_name, c.email, s.contract_type, s.manager_name,
+        s.location_id, s.location_name, c.effective_from, NULL, true, s.attribute_hash
+    FROM practitioner_changes AS c
+    JOIN practitioner_source AS s ON s.practitioner_id = c.practitioner_id;
+
+    DROP TABLE practitioner_changes;
+    DROP TABLE practitioner_source;
+END;
+$$;
+
+-- Keep the dimension in step with every roster change
+CREATE OR REPLACE FUNCTION model.sync_dim_practitioner_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM model.sync_dim_practitioner();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS practitioner_sync_dim ON planning1.practitioner;
+CREATE TRIGGER practitioner_sync_dim
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON planning1.practitioner
+    FOR EACH STATEMENT EXECUTE FUNCTION model.sync_dim_practitioner_trigger();
+
+-- Initial load
+SELECT * FROM model.sync_dim_practitioner();
+
+COMMIT;
@@ -0,0 +1,54 @@
+-- Migration: support incremental loading of target hours from planning1.target_update into model.Fact_Performance
+-- Run once after Create.sql and tables.sql. Safe to re-run; run it again after Partition_target_update.sql,
+-- which replaces planning1.target_update together with its indexes and triggers.
+
+-- Connect to the database
+\c dashboard;
+
+-- High-water marks of the incremental loaders (one row per job)
+CREATE TABLE IF NOT EXISTS model.etl_watermark (
+    job_name VARCHAR(100) PRIMARY KEY,
+    high_water_mark TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- One fact row per practitioner version and day, so target hours can be upserted
+CREATE UNIQUE INDEX IF NOT EXISTS fact_performance_date_practitioner_idx
+    ON model.Fact_Performance (date, practitioner_dim_id);
+
+-- Changed targets are found by updated_at
+CREATE INDEX IF NOT EXISTS target_update_updated_at_idx
+    ON planning1.target_update (updated_at);
+
+-- Current dimension row lookup by source practitioner_id
+CREATE INDEX IF NOT EXISTS dim_practitioner_current_idx
+    ON model.Dim_Practitioner (practitioner_id) WHERE is_current;
+
+-- Lookup of the dimension version effective on a target date
+CREATE INDEX IF NOT EXISTS dim_practitioner_effective_idx
+    ON model.Dim_Practitioner (practitioner_id, effective_start_date);
+
+-- Deleted targets leave no updated_at trace, so every delete records a tombstone here.
+-- The fact loader claims the tombstones on its next run and clears the matching fact target hours.
+CREATE TABLE IF NOT EXISTS planning1.target_update_deleted (
+    practitioner_id INTEGER NOT NULL,
+    target_date TIMESTAMP NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION planning1.record_target_deletes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO planning1.target_update_deleted (practitioner_id, target_date)
+    SELECT practitioner_id, target_date FROM old_rows;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS target_update_record_deletes ON planning1.target_update;
+CREATE TRIGGER target_update_record_deletes
+    AFTER DELETE ON planning1.target_update
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION planning1.record_target_deletes();
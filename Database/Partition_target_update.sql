@@ -0,0 +1,97 @@
+-- Migration: index and range-partition planning1.target_update by year
+-- Run once against an existing database created with Create.sql.
+
+-- Connect to the database
+\c dashboard;
+
+BEGIN;
+
+-- Keep the existing data while the partitioned table is built
+ALTER TABLE planning1.target_update RENAME TO target_update_old;
+ALTER TABLE planning1.target_update_old RENAME CONSTRAINT unique_practitioner_date TO unique_practitioner_date_old;
+
+-- Create the partitioned target_update table (the unique constraint includes the partition key)
+CREATE TABLE planning1.target_update (
+    practitioner_id INTEGER,
+    practitioner_name CHARACTER VARYING(255),
+    target_date TIMESTAMP,
+    target_hour DOUBLE PRECISION,
+    updated_at TIMESTAMP,
+    CONSTRAINT unique_practitioner_date UNIQUE (practitioner_id, target_date)
+) PARTITION BY RANGE (target_date);
+
+-- Index for date-range scans and the latest-week lookup used by cloning
+CREATE INDEX IF NOT EXISTS target_update_target_date_idx ON planning1.target_update (target_date);
+
+-- Catch-all partition for dates without a yearly partition yet
+CREATE TABLE planning1.target_update_default PARTITION OF planning1.target_update DEFAULT;
+
+-- Create the yearly partition for partition_year, moving any of its rows out of the default partition.
+-- Safe to call repeatedly; run it for next year during the annual rollover, e.g.
+--   SELECT planning1.create_target_update_partition(EXTRACT(YEAR FROM now())::INT + 1);
+CREATE OR REPLACE FUNCTION planning1.create_target_update_partition(partition_year INTEGER)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    partition_name TEXT := format('target_update_%s', partition_year);
+    range_start TIMESTAMP := make_date(partition_year, 1, 1);
+    range_end TIMESTAMP := make_date(partition_year + 1, 1, 1);
+BEGIN
+    IF to_regclass(format('planning1.%I', partition_name)) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- A new partition cannot be attached while the default partition holds rows in its range
+    CREATE TEMP TABLE target_update_pending AS
+    SELECT * FROM planning1.target_update_default
+    WHERE target_date >= range_start AND target_date < range_end;
+
+    DELETE FROM planning1.target_update_default
+    WHERE target_date >= range_start AND target_date < range_end;
+
+    EXECUTE format(
+        'CREATE TABLE planning1.%I PARTITION OF planning1.target_update FOR VALUES FROM (%L) TO (%L)',
+        partition_name, range_start, range_end
+    );
+
+    INSERT INTO planning1.target_update SELECT * FROM target_update_pending;
+    DROP TABLE target_update_pending;
+
+    RETURN partition_name;
+END;
+$$;
+
+-- Yearly partitions from the oldest target through next year
+SELECT planning1.create_target_update_partition(partition_year)
+FROM generate_series(
+    COALESCE((SELECT EXTRACT(YEAR FROM min(target_date))::INT FROM planning1.target_update_old), EXTRACT(YEAR FROM now())::INT),
+    GREATEST(
+        (SELECT EXTRACT(YEAR FROM max(target_date))::INT FROM planning1.target_update_old),
+        EXTRACT(YEAR FROM now())::INT + 1
+    )
+) AS partition_year;
+
+-- Copy the existing targets into their partitions
+INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
+SELECT practitioner_id, practitioner_name, target_date, target_hour, updated_at
+FROM planning1.target_update_old;
+
+DROP TABLE planning1.target_update_old;
+
+-- Keep recording deletes for the fact loader if Fact_target_etl.sql was already applied
+DO $$
+BEGIN
+    IF to_regproc('planning1.record_target_deletes') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS target_update_updated_at_idx ON planning1.target_update (updated_at);
+        CREATE TRIGGER target_update_record_deletes
+            AFTER DELETE ON planning1.target_update
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION planning1.record_target_deletes();
+    END IF;
+END;
+$$;
+
+COMMIT;
+
+ANALYZE planning1.target_update;
@@ -0,0 +1,149 @@
+-- Migration: pre-aggregated week/month/quarter/year rollups of model.Fact_Performance for the dashboard
+-- Run once after tables.sql and Fact_target_etl.sql (re-run it after upgrading), then build the rollups with:
+--   SELECT model.refresh_performance_rollups(true);
+
+-- Connect to the database
+\c dashboard;
+
+-- Actual vs target hours per period (grain) and per practitioner, manager or location (dimension).
+-- Weeks are ISO weeks: period_year is the ISO year and period_number the ISO week (Dim_Date.week_of_year), so
+-- 2024-12-30 belongs to 2025 week 1. Other grains use the calendar year and month, quarter or 1.
+-- period_start is the first day of the period (the Monday of a week).
+CREATE TABLE IF NOT EXISTS model.Rollup_Performance (
+    grain VARCHAR(10) NOT NULL,
+    period_year INT NOT NULL,
+    period_number INT NOT NULL,
+    period_start DATE NOT NULL,
+    dimension VARCHAR(20) NOT NULL,
+    dimension_key VARCHAR(100) NOT NULL,
+    dimension_label VARCHAR(100),
+    target_hour DECIMAL(12, 1),
+    actual_hour DECIMAL(12, 1),
+    total_billing DECIMAL(14, 1),
+    day_count INT NOT NULL,
+    PRIMARY KEY (grain, dimension, period_year, period_number, dimension_key)
+);
+
+-- Dates whose facts changed since the last refresh
+CREATE TABLE IF NOT EXISTS model.rollup_dirty_dates (
+    date DATE PRIMARY KEY
+);
+
+-- Record the dates touched by every statement on Fact_Performance
+CREATE OR REPLACE FUNCTION model.mark_rollup_dates_dirty()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO model.rollup_dirty_dates (date)
+        SELECT DISTINCT date FROM new_rows
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO model.rollup_dirty_dates (date)
+        SELECT DISTINCT date FROM old_rows
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS fact_performance_rollup_insert ON model.Fact_Performance;
+CREATE TRIGGER fact_performance_rollup_insert
+    AFTER INSERT ON model.Fact_Performance
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION model.mark_rollup_dates_dirty();
+
+DROP TRIGGER IF EXISTS fact_performance_rollup_update ON model.Fact_Performance;
+CREATE TRIGGER fact_performance_rollup_update
+    AFTER UPDATE ON model.Fact_Performance
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION model.mark_rollup_dates_dirty();
+
+DROP TRIGGER IF EXISTS fact_performance_rollup_delete ON model.Fact_Performance;
+CREATE TRIGGER fact_performance_rollup_delete
+    AFTER DELETE ON model.Fact_Performance
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION model.mark_rollup_dates_dirty();
+
+-- The week, month, quarter and year period of a date: (grain, period_year, period_number, period_start).
+-- Weeks are keyed by ISO year and ISO week so that no bucket spans two ISO weeks.
+CREATE OR REPLACE FUNCTION model.rollup_periods(period_date DATE)
+RETURNS TABLE (grain VARCHAR(10), period_year INT, period_number INT, period_start DATE)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    VALUES
+        ('week'::VARCHAR(10), EXTRACT(ISOYEAR FROM period_date)::INT, EXTRACT(WEEK FROM period_date)::INT,
+         date_trunc('week', period_date)::DATE),
+        ('month', EXTRACT(YEAR FROM period_date)::INT, EXTRACT(MONTH FROM period_date)::INT,
+         date_trunc('month', period_date)::DATE),
+        ('quarter', EXTRACT(YEAR FROM period_date)::INT, EXTRACT(QUARTER FROM period_date)::INT,
+         date_trunc('quarter', period_date)::DATE),
+        ('year', EXTRACT(YEAR FROM period_date)::INT, 1, date_trunc('year', period_date)::DATE)
+$$;
+
+-- Rebuild only the rollup periods that contain a dirty date (every period when full_rebuild is set,
+-- after clearing the table). Returns the number of rollup rows written.
+CREATE OR REPLACE FUNCTION model.refresh_performance_rollups(full_rebuild BOOLEAN DEFAULT false)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    rows_written INTEGER;
+BEGIN
+    IF full_rebuild THEN
+        DELETE FROM model.Rollup_Performance;
+        INSERT INTO model.rollup_dirty_dates (date)
+        SELECT DISTINCT date FROM model.Fact_Performance
+        ON CONFLICT DO NOTHING;
+    END IF;
+
+    -- Claim the dirty dates and expand them to the periods they belong to
+    CREATE TEMP TABLE rollup_affected (
+        grain VARCHAR(10),
+        period_year INT,
+        period_number INT
+    ) ON COMMIT DROP;
+
+    WITH claimed AS (
+        DELETE FROM model.rollup_dirty_dates RETURNING date
+    )
+    INSERT INTO rollup_affected (grain, period_year, period_number)
+    SELECT DISTINCT g.grain, g.period_year, g.period_number
+    FROM claimed AS c
+    JOIN model.Dim_Date AS d ON d.date = c.date
+    CROSS JOIN LATERAL model.rollup_periods(d.date) AS g;
+
+    DELETE FROM model.Rollup_Performance AS r
+    USING rollup_affected AS a
+    WHERE r.grain = a.grain AND r.period_year = a.period_year AND r.period_number = a.period_number;
+
+    INSERT INTO model.Rollup_Performance (
+        grain, period_year, period_number, period_start, dimension, dimension_key, dimension_label,
+        target_hour, actual_hour, total_billing, day_count
+    )
+    SELECT
+        g.grain, g.period_year, g.period_number, min(g.period_start), k.dimension, k.dimension_key, max(k.dimension_label),
+        sum(f.target_hour), sum(f.actual_hour), sum(f.total_billing), count(DISTINCT f.date)
+    FROM model.Fact_Performance AS f
+    JOIN model.Dim_Date AS d ON d.date = f.date
+    JOIN model.Dim_Practitioner AS p ON p.practitioner_dim_id = f.practitioner_dim_id
+    LEFT JOIN model.Dim_Location AS l ON l.location_id = f.location_id
+    CROSS JOIN LATERAL model.rollup_periods(d.date) AS g
+    JOIN rollup_affected AS a
+        ON a.grain = g.grain AND a.period_year = g.period_year AND a.period_number = g.period_number
+    CROSS JOIN LATERAL (
+        VALUES
+            ('practitioner', p.practitioner_id::TEXT, p.practitioner_name),
+            ('manager', COALESCE(p.manager_name, '(none)'), p.manager_name),
+            ('location', f.location_id::TEXT, l.location_name)
+    ) AS k(dimension, dimension_key, dimension_label)
+    GROUP BY g.grain, g.period_year, g.period_number, k.dimension, k.dimension_key;
+
+    GET DIAGNOSTICS rows_written = ROW_COUNT;
+    DROP TABLE rollup_affected;
+    RETURN rows_written;
+END;
+$$;
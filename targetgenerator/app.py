@@ -1,33 +1,67 @@
+import functools
+import io
+import os
+import time
 import streamlit as st
 import pandas as pd
-from datetime import timedelta, datetime
+from datetime import datetime
 import psycopg2
 import matplotlib.pyplot as plt
 from streamlit_option_menu import option_menu
-
-# Need to register for online cloud to host the data here
-host = ""
-dbname = ""
-user = ""
-password = ""
-port = ""
-
-# Database connection function
+import db
+import instrumentation
+import target_operations as ops
+from fact_etl import sync_fact_targets
+from rollups import refresh_rollups
+from target_charts import CHART_MODES, RESAMPLE_RULES, build_chart_frames, plot_target_chart
+from target_export import count_export_rows, export_targets_csv, export_targets_parquet
+from target_import import MAX_TARGET_HOUR, MIN_TARGET_HOUR, merge_targets, read_target_file, validate_targets
+from target_schedule import DAYS_OF_WEEK
+from target_snapshot import TargetSnapshot
+
+# Roster cache settings: how long a cached roster may live, and how often the table fingerprint is rechecked
+ROSTER_CACHE_TTL = int(os.getenv("ROSTER_CACHE_TTL", "3600"))
+ROSTER_FINGERPRINT_TTL = int(os.getenv("ROSTER_FINGERPRINT_TTL", "60"))
+
+# Push target changes to the dashboard facts and rollups after every write (needs the reporting migrations)
+REFRESH_DASHBOARD_AFTER_WRITES = os.getenv("REFRESH_DASHBOARD_AFTER_WRITES", "0") == "1"
+
+# Maximum number of points drawn by the history chart before it is downsampled
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "5000"))
+
+# Consolidated target frames kept per session, and how long a checked frame is reused before
+# it is checked for changes again (writes and "Refresh" force a check)
+TARGET_FRAME_CACHE_SIZE = int(os.getenv("TARGET_FRAME_CACHE_SIZE", "4"))
+TARGET_FRAME_RECHECK_SECONDS = float(os.getenv("TARGET_FRAME_RECHECK_SECONDS", "2"))
+
+# Optional local DuckDB snapshot answering the View tab (empty = query Postgres directly),
+# and how often it is brought up to date
+TARGET_SNAPSHOT_PATH = os.getenv("TARGET_SNAPSHOT_PATH", "")
+TARGET_SNAPSHOT_REFRESH_TTL = int(os.getenv("TARGET_SNAPSHOT_REFRESH_TTL", "60"))
+
+# Largest export offered for download in the browser; the download button holds the whole file
+# in memory, so bigger exports are refused and left to the `export` command of cli.py
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "500000"))
+
+
+# Process-wide connection pool shared by every session
+@st.cache_resource
+def get_connection_pool():
+    return db.create_pool(cursor_factory=instrumentation.cursor_factory())
+
+# Database connection function: borrows a connection from the shared pool
 def create_connection():
-    conn = None
     try:
-        conn = psycopg2.connect(
-            host=host,
-            dbname=dbname,
-            user=user,
-            password=password,
-            port=port
-        )
-        return conn
+        with instrumentation.checkout():
+            return get_connection_pool().getconn()
     except Exception as e:
         st.error(f"Error: {e}")
         return None
 
+# Return a borrowed connection to the pool
+def release_connection(conn):
+    get_connection_pool().putconn(conn)
+
 # Predefined credentials (you can replace this with a database later)
 USER_CREDENTIALS = {
     "admin": "test123",
@@ -62,17 +96,83 @@ def show_login_page():
     if st.button("Login"):
         login(username, password)
 
-# Load data from the practitioner table
+# Raised inside cached loaders when no pooled connection is available. Streamlit does not cache
+# exceptions, so a failed checkout is retried on the next call instead of being served from the cache.
+class NoConnectionError(Exception):
+    pass
+
+# Cheap fingerprint of planning1.practitioner (row count + newest row version), used as the roster cache version stamp.
+# Rechecked at most once per ROSTER_FINGERPRINT_TTL seconds.
+@st.cache_data(ttl=ROSTER_FINGERPRINT_TTL, show_spinner=False)
+def load_roster_version():
+    conn = create_connection()
+    if not conn:
+        raise NoConnectionError()
+    try:
+        return ops.load_roster_version(conn)
+    finally:
+        release_connection(conn)
+
+# Load data from the practitioner table, cached per roster version
+@st.cache_data(ttl=ROSTER_CACHE_TTL, max_entries=4, show_spinner=False)
+def load_practitioners_snapshot(version):
+    conn = create_connection()
+    if not conn:
+        raise NoConnectionError()
+    try:
+        return ops.load_roster(conn)
+    finally:
+        release_connection(conn)
+
+# Distinct location/manager pairs for the filter lists, cached per roster version
+@st.cache_data(ttl=ROSTER_CACHE_TTL, max_entries=4, show_spinner=False)
+def load_location_manager_snapshot(version):
+    practitioners_df = load_practitioners_snapshot(version)
+    if practitioners_df.empty:
+        return pd.DataFrame(columns=['clinic_location', 'manager_name'])
+    return practitioners_df[['clinic_location', 'manager_name']].drop_duplicates().reset_index(drop=True)
+
+# Current roster version, or None when the database could not be reached (create_connection shows the error)
+def current_roster_version():
+    try:
+        return load_roster_version()
+    except NoConnectionError:
+        return None
+
+# Load data from the practitioner table (served from cache until the table changes)
 def load_practitioners():
+    try:
+        version = load_roster_version()
+        return load_practitioners_snapshot(version)
+    except NoConnectionError:
+        return pd.DataFrame()
+
+# Load the location/manager lookup lists (served from cache until the table changes)
+def load_location_manager_lookup():
+    try:
+        version = load_roster_version()
+        return load_location_manager_snapshot(version)
+    except NoConnectionError:
+        return pd.DataFrame(columns=['clinic_location', 'manager_name'])
+
+# Load changed targets into Fact_Performance and rebuild the affected dashboard rollup periods
+def refresh_dashboard():
     conn = create_connection()
     if conn:
         try:
-            query = "SELECT practitioner_id, practitioner_name, clinic_location, manager_name FROM planning1.practitioner;"
-            df = pd.read_sql(query, conn)
-            return df
+            sync_fact_targets(conn)
+            refresh_rollups(conn)
+        except Exception as e:
+            st.warning(f"Targets were saved, but the dashboard refresh failed: {e}")
         finally:
-            conn.close()
-    return pd.DataFrame()
+            release_connection(conn)
+
+# Called after a successful write to planning1.target_update
+def after_target_write():
+    mark_target_frames_stale()
+    refresh_target_snapshot.clear()
+    if REFRESH_DASHBOARD_AFTER_WRITES:
+        refresh_dashboard()
 
 # Streamlit sidebar menu
 def streamlit_menu():
@@ -80,159 +180,171 @@ def streamlit_menu():
     with st.sidebar:
         selected = option_menu(
             menu_title="Admin Menu",  # required
-            options=["Set", "View", "Edit", "Delete"],  # required
-            icons=["plus-circle", "book", "pencil-square","trash"],  # optional
+            options=["Set", "View", "Edit", "Delete", "Import", "Export"],  # required
+            icons=["plus-circle", "book", "pencil-square","trash", "upload", "download"],  # optional
             menu_icon="cast",  # optional
             default_index=0,  # optional
         )
     return selected
 
 
-# Insert target updates for specified days
-def insert_target_updates(practitioner_id, practitioner_name, start_date, end_date, target_hours):
-    conn = create_connection()
-    records_updated = 0
-    conflicts_found = False
-    holidays_skipped = []
+# Display the outcome of a set or clone operation
+def display_insert_result(result, success_message, empty_message):
+    if result.holidays_skipped:
+        skipped_dates = ', '.join([date.strftime("%Y-%m-%d") for date in result.holidays_skipped])
+        st.info(f"The following dates were skipped due to statutory holidays: {skipped_dates}")
+    if result.conflicts_found:
+        st.error("Some dates already have existing targets. Please use the Edit tab to modify existing records.")
+    elif result.records_inserted > 0:
+        st.success(success_message.format(count=result.records_inserted))
+    else:
+        st.warning(empty_message)
+
 
+# Compute a set or clone plan with one read query and keep its summary in the session until it is confirmed
+def plan_targets(plan_key, planner, *args):
+    conn = create_connection()
     if conn:
         try:
-            with conn.cursor() as cursor:
-                # Fetch all holiday dates
-                cursor.execute("SELECT holiday_date FROM planning1.statutory_holidays;")
-                holidays = {row[0] for row in cursor.fetchall()}
-
-                date = start_date
-                while date <= end_date:
-                    weekday = date.strftime('%A')
-                    if weekday in target_hours:
-                        if date in holidays:
-                            holidays_skipped.append(date)
-                        else:
-                            practitioner_id_int = int(practitioner_id)
-                            target_hour = float(target_hours[weekday])
-                            target_date = date
-
-                            # Check if a record already exists
-                            check_query = """
-                            SELECT COUNT(*) FROM planning1.target_update
-                            WHERE practitioner_id = %s AND target_date = %s;
-                            """
-                            cursor.execute(check_query, (practitioner_id_int, target_date))
-                            record_exists = cursor.fetchone()[0]
-
-                            if record_exists > 0:
-                                conflicts_found = True
-                            else:
-                                # Insert new target
-                                insert_query = """
-                                INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
-                                VALUES (%s, %s, %s, %s, %s);
-                                """
-                                cursor.execute(insert_query, (practitioner_id_int, practitioner_name, target_date, target_hour, datetime.now()))
-                                records_updated += 1
-                    date += timedelta(days=1)
-                conn.commit()
-
-            # Display appropriate messages based on the results
-            if holidays_skipped:
-                skipped_dates = ', '.join([date.strftime("%Y-%m-%d") for date in holidays_skipped])
-                st.info(f"The following dates were skipped due to statutory holidays: {skipped_dates}")
-            if conflicts_found:
-                st.error("Some dates already have existing targets. Please use the Edit tab to modify existing records.")
-            elif records_updated > 0:
-                st.success(f"Target hours set successfully for {records_updated} days!")
-            else:
-                st.warning("No new targets were set. Please use the Edit tab to modify existing targets.")
+            st.session_state["target_plan"] = {"key": plan_key, "plan": planner(conn, *args)}
         except Exception as e:
-            st.error(f"Failed to set target hours: {e}")
+            st.error(f"Failed to plan the operation: {e}")
         finally:
-            conn.close()
-
+            release_connection(conn)
 
-
-# Set target for batch 
-def insert_target_updates_batch(practitioners_list, start_date, end_date, target_hours):
+# Read a plan's row-level detail and render it as CSV; only done when the user asks for it, since the
+# detail of a large selection can run to millions of rows
+def load_plan_details_csv(plan):
     conn = create_connection()
-    records_updated = 0
-    conflicts_found = False
-    holidays_skipped = []
-
     if conn:
         try:
-            with conn.cursor() as cursor:
-                # Fetch all holiday dates
-                cursor.execute("SELECT holiday_date FROM planning1.statutory_holidays;")
-                holidays = {row[0] for row in cursor.fetchall()}
-
-                for practitioner in practitioners_list:
-                    practitioner_id = int(practitioner['practitioner_id'])
-                    practitioner_name = practitioner['practitioner_name']
-                    date = start_date
-                    while date <= end_date:
-                        weekday = date.strftime('%A')
-                        if weekday in target_hours:
-                            if date in holidays:
-                                holidays_skipped.append(date)
-                            else:
-                                target_hour = float(target_hours[weekday])
-
-                                # Check if a record already exists
-                                check_query = """
-                                SELECT COUNT(*) FROM planning1.target_update
-                                WHERE practitioner_id = %s AND target_date = %s;
-                                """
-                                cursor.execute(check_query, (practitioner_id, date))
-                                record_exists = cursor.fetchone()[0]
-
-                                if record_exists > 0:
-                                    conflicts_found = True
-                                else:
-                                    # Insert new target
-                                    insert_query = """
-                                    INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
-                                    VALUES (%s, %s, %s, %s, %s);
-                                    """
-                                    cursor.execute(insert_query, (practitioner_id, practitioner_name, date, target_hour, datetime.now()))
-                                    records_updated += 1
-                        date += timedelta(days=1)
-                conn.commit()
-
-            # Display appropriate messages based on the results
-            if holidays_skipped:
-                skipped_dates = ', '.join([date.strftime("%Y-%m-%d") for date in holidays_skipped])
-                st.info(f"The following dates were skipped due to statutory holidays: {skipped_dates}")
-            if conflicts_found:
-                st.error("Some dates already have existing targets. Please use the Edit tab to modify existing records.")
-            elif records_updated > 0:
-                st.success(f"Target hours set successfully for {records_updated} days!")
-            else:
-                st.warning("No new targets were set. Please use the Edit tab to modify existing targets.")
+            return ops.load_plan_detail(conn, plan).to_csv(index=False).encode()
         except Exception as e:
-            st.error(f"Failed to set target hours: {e}")
+            st.error(f"Failed to load the plan details: {e}")
         finally:
-            conn.close()
-
+            release_connection(conn)
+    return None
+
+# Show the pending plan for these inputs (per-practitioner summary, detail on request) and apply it on
+# confirmation, as long as the targets still match the plan
+def show_target_plan(plan_key, success_message, empty_message):
+    pending = st.session_state.get("target_plan")
+    if not pending or pending["key"] != plan_key:
+        return
+    plan = pending["plan"]
+
+    st.subheader("Planned Changes")
+    if plan.source_week_start is not None:
+        st.caption(f"Cloning the week starting {pd.Timestamp(plan.source_week_start):%Y-%m-%d}.")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Targets to insert", plan.records_to_insert)
+    col2.metric("Existing targets kept", plan.conflicts)
+    col3.metric("Holiday dates skipped", len(plan.holidays_skipped))
+    st.dataframe(plan.summary, hide_index=True, use_container_width=True)
+    if plan.conflicts:
+        st.warning("Dates that already have a target are left unchanged; their current values are in the plan details. "
+                   "Use the Edit tab to modify them.")
+    if st.button("Prepare Plan Details"):
+        details_csv = load_plan_details_csv(plan)
+        if details_csv is not None:
+            st.download_button(
+                "Download Plan Details",
+                details_csv,
+                file_name=f"{plan.operation}_plan_{plan.start_date}_{plan.end_date}.csv",
+                mime="text/csv"
+            )
 
+    if not plan.records_to_insert:
+        st.warning(empty_message)
+        return
+    if st.button(f"Confirm and Apply ({plan.records_to_insert} targets)"):
+        conn = create_connection()
+        if conn:
+            try:
+                result = ops.apply_plan(conn, plan)
+                del st.session_state["target_plan"]
+                after_target_write()
+                display_insert_result(result, success_message, empty_message)
+            except ops.StalePlanError as e:
+                del st.session_state["target_plan"]
+                st.error(str(e))
+            except Exception as e:
+                st.error(f"Failed to apply the plan: {e}")
+            finally:
+                release_connection(conn)
+
+# Make the next read of every cached target frame check the database for changes
+def mark_target_frames_stale():
+    for entry in st.session_state.get("target_frames", {}).values():
+        entry["checked_at"] = None
+
+# Forget every cached target frame so the next read reloads it in full. Used by the explicit Refresh:
+# the delta path cannot see rows committed behind the lookback window or stamped by a skewed app clock
+def drop_target_frames():
+    st.session_state.pop("target_frames", None)
+
+# Load target updates with practitioner name for a group of practitioners and date range.
+# The frame is kept in the session per (roster version, selection, range); later automatic reruns only
+# transfer rows changed since it was loaded, plus practitioners whose rows were deleted.
+def load_target_updates_many(practitioner_ids, start_date, end_date):
+    practitioner_ids = sorted(int(practitioner_id) for practitioner_id in practitioner_ids)
+    if not practitioner_ids:
+        return ops.empty_target_updates()
+
+    frames = st.session_state.setdefault("target_frames", {})
+    key = (current_roster_version(), tuple(practitioner_ids), start_date, end_date)
+    entry = frames.pop(key, None)
+    if entry and entry["checked_at"] is not None and time.monotonic() - entry["checked_at"] < TARGET_FRAME_RECHECK_SECONDS:
+        frames[key] = entry
+        return entry["frame"].targets
 
-# Load target updates with practitioner name for a specific practitioner and date range
-def load_target_updates(practitioner_id, start_date, end_date):
+    conn = create_connection()
+    if not conn:
+        return ops.empty_target_updates()
+    try:
+        if entry:
+            target_frame, _ = ops.refresh_target_frame(conn, entry["frame"])
+        else:
+            target_frame = ops.load_target_frame(conn, practitioner_ids, start_date, end_date)
+    finally:
+        release_connection(conn)
+
+    # Most recently used last; drop the oldest selections beyond the cache size
+    frames[key] = {"frame": target_frame, "checked_at": time.monotonic()}
+    while len(frames) > TARGET_FRAME_CACHE_SIZE:
+        frames.pop(next(iter(frames)))
+    return target_frame.targets
+
+# Process-wide local snapshot of the targets, or None when disabled
+@st.cache_resource
+def get_target_snapshot():
+    return TargetSnapshot(TARGET_SNAPSHOT_PATH) if TARGET_SNAPSHOT_PATH else None
+
+# Copy target changes into the local snapshot at most once per TARGET_SNAPSHOT_REFRESH_TTL seconds.
+# Returns the snapshot's high-water mark, or None if the refresh failed.
+@st.cache_data(ttl=TARGET_SNAPSHOT_REFRESH_TTL, show_spinner=False)
+def refresh_target_snapshot():
     conn = create_connection()
     if conn:
         try:
-            practitioner_id = int(practitioner_id)  # Ensure practitioner_id is a Python int
-            query = """
-            SELECT p.practitioner_id, p.practitioner_name, t.target_date, t.target_hour 
-            FROM planning1.target_update AS t
-            JOIN planning1.practitioner AS p ON t.practitioner_id = p.practitioner_id
-            WHERE t.practitioner_id = %s AND t.target_date BETWEEN %s AND %s
-            ORDER BY t.target_date;
-            """
-            df = pd.read_sql(query, conn, params=(practitioner_id, start_date, end_date))
-            return df
+            return str(get_target_snapshot().refresh(conn).high_water_mark)
         finally:
-            conn.close()
-    return pd.DataFrame()
+            release_connection(conn)
+    return None
+
+# Load target updates for the View tab: from the local snapshot when enabled, otherwise from Postgres
+def load_view_target_updates(practitioner_ids, start_date, end_date):
+    if TARGET_SNAPSHOT_PATH:
+        try:
+            if refresh_target_snapshot() is not None:
+                return get_target_snapshot().load_target_updates_many(practitioner_ids, start_date, end_date)
+        except Exception as e:
+            st.warning(f"Local snapshot unavailable, reading from the database: {e}")
+    return load_target_updates_many(practitioner_ids, start_date, end_date)
+
+# Load target updates with practitioner name for a specific practitioner and date range
+def load_target_updates(practitioner_id, start_date, end_date):
+    return load_target_updates_many([practitioner_id], start_date, end_date)
 
 # Helper function for display target updates
 def load_practitioner_name(practitioner_id):
@@ -248,301 +360,435 @@ def load_practitioner_name(practitioner_id):
         except Exception as e:
             st.error(f"Failed to load practitioner name: {e}")
         finally:
-            conn.close()
+            release_connection(conn)
     return "Unknown"
 
-# Define the function to display target updates
-def display_target_updates(selected_practitioners, start_date, end_date):
+# Define the function to display target updates (from the local snapshot with use_snapshot)
+def display_target_updates(selected_practitioners, start_date, end_date, use_snapshot=False):
     # Ensure `selected_practitioners` is a list, even for a single practitioner
     if isinstance(selected_practitioners, int):
         practitioner_id = selected_practitioners
         practitioner_name = load_practitioner_name(practitioner_id)
         selected_practitioners = [{'practitioner_id': practitioner_id, 'practitioner_name': practitioner_name}]
     
-    # Prepare a DataFrame to collect target updates for the entire group
-    all_target_updates = pd.DataFrame()
-
-    # Loop through each practitioner in the selected group
-    for practitioner in selected_practitioners:
-        practitioner_id = practitioner['practitioner_id']
-        practitioner_name = practitioner['practitioner_name']
-        
-        # Load target updates for the practitioner
-        target_updates_df = load_target_updates(practitioner_id, start_date, end_date)
-        
-        if not target_updates_df.empty:
-            # Add the practitioner's name and ID to the DataFrame for display
-            target_updates_df['practitioner_name'] = practitioner_name
-            target_updates_df['practitioner_id'] = practitioner_id
-            all_target_updates = pd.concat([all_target_updates, target_updates_df], ignore_index=True)
+    # Load target updates for the entire group in one round trip
+    practitioner_ids = [practitioner['practitioner_id'] for practitioner in selected_practitioners]
+    loader = load_view_target_updates if use_snapshot else load_target_updates_many
+    all_target_updates = loader(practitioner_ids, start_date, end_date)
 
     # Display a single consolidated table if there are records
     if not all_target_updates.empty:
-        # Sort the table by practitioner_name and target_date for better readability
-        all_target_updates.sort_values(by=['practitioner_name', 'target_date'], inplace=True)
+        # Rows are already sorted by practitioner_name and target_date for better readability
         st.write(f"Consolidated target hours for the selected period ({start_date} to {end_date}):")
         st.dataframe(all_target_updates)
     else:
         st.warning("No target data available for the selected period.")
 
-# Cloning function
-import pandas as pd
+# st.fragment whose runs are traced: as a span of the full rerun, or on their own when only the fragment
+# reruns, so widget changes inside fragments still show up in the instrumentation panel and log
+def traced_fragment(func):
+    @functools.wraps(func)
+    def body(*args, **kwargs):
+        with instrumentation.fragment(func.__name__, st.session_state["username"]) as trace:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if trace is not None:
+                    remember_rerun(trace)
+    return st.fragment(body)
+
+# Location, manager and practitioner filters and the date range of a tab. The widgets run in a fragment,
+# so changing them only reruns this panel (roster lookups are cached); the tab reads the database with the
+# selection last applied with "Apply Filters", stored in st.session_state[f"{tab}_filters"].
+@traced_fragment
+def practitioner_filter_panel(tab, practitioners_df, lookup_df):
+    # Fresh widgets (first visit or coming back from another tab) start from everything selected and today
+    if f"{tab}_locations" not in st.session_state:
+        st.session_state.pop(f"{tab}_filters", None)
+
+    # Multiselect for Location
+    locations = st.multiselect(
+        "Select Location(s)",
+        lookup_df['clinic_location'].unique(),
+        default=lookup_df['clinic_location'].unique(),
+        key=f"{tab}_locations"
+    )
 
-def clone_target_updates_with_preview(practitioners_list, start_date, end_date):
-    conn = create_connection()
-    records_cloned = 0
-    conflicts_found = False
-    holidays_skipped = []
-    preview_df = pd.DataFrame()
+    # Filter practitioners based on selected locations
+    filtered_df = practitioners_df[practitioners_df['clinic_location'].isin(locations)]
+    manager_options = lookup_df.loc[lookup_df['clinic_location'].isin(locations), 'manager_name'].unique()
+
+    # Multiselect for Manager (filtered based on selected locations)
+    managers = st.multiselect(
+        "Select Manager(s)",
+        manager_options,
+        default=manager_options,
+        key=f"{tab}_managers"
+    )
+
+    # Further filter practitioners based on selected managers
+    filtered_df = filtered_df[filtered_df['manager_name'].isin(managers)]
+
+    # Multiselect for Practitioner (filtered based on selected locations and managers)
+    practitioners = st.multiselect(
+        "Select Practitioner(s)",
+        filtered_df['practitioner_name'].unique(),
+        default=filtered_df['practitioner_name'].unique(),
+        key=f"{tab}_practitioners"
+    )
+
+    # Final list of selected practitioners
+    selected_practitioners = filtered_df[filtered_df['practitioner_name'].isin(practitioners)].to_dict('records')
 
+    # Display selection summary
+    if selected_practitioners:
+        st.success(f"{len(selected_practitioners)} practitioner(s) selected.")
+    else:
+        st.warning("No practitioners selected. Please adjust your filters.")
+
+    # Select date range
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Start Date", key=f"{tab}_start_date")
+    with col2:
+        end_date = st.date_input("End Date", key=f"{tab}_end_date")
+
+    filters = {'practitioners': selected_practitioners, 'start_date': start_date, 'end_date': end_date}
+    applied = st.session_state.setdefault(f"{tab}_filters", filters)
+    if st.button("Apply Filters", key=f"{tab}_apply_filters", type="primary"):
+        st.session_state[f"{tab}_filters"] = filters
+        st.rerun()
+    elif filter_signature(filters) != filter_signature(applied):
+        st.info("Filters changed. Click Apply Filters to load the targets for this selection.")
+
+# Comparable form of a filter selection (the practitioner records may hold NaN values)
+def filter_signature(filters):
+    practitioner_ids = tuple(practitioner['practitioner_id'] for practitioner in filters['practitioners'])
+    return practitioner_ids, filters['start_date'], filters['end_date']
+
+# Selection last applied in a tab's filter panel: (selected practitioners, start date, end date)
+def applied_filters(tab):
+    filters = st.session_state[f"{tab}_filters"]
+    return filters['practitioners'], filters['start_date'], filters['end_date']
+
+# Consolidated target table with its Refresh button, in a fragment: Refresh reruns only the table,
+# or the whole tab with refresh_app when other sections (chart, edit grids) show the same targets
+@traced_fragment
+def target_table_panel(selected_practitioners, start_date, end_date, use_snapshot=False, refresh_app=False):
+    if st.button("Refresh", key="refresh_button"):
+        # Recheck the roster fingerprint; the cached roster is only reloaded if the table changed
+        load_roster_version.clear()
+        # Reload the targets in full rather than through the delta path
+        drop_target_frames()
+        if use_snapshot:
+            # Pull target changes into the local snapshot now instead of waiting for its refresh interval
+            refresh_target_snapshot.clear()
+        if refresh_app:
+            st.rerun()
+    display_target_updates(selected_practitioners, start_date, end_date, use_snapshot=use_snapshot)
+
+# Load the clone preview of the latest week, returning the connection before planning so a session
+# never holds one pooled connection while waiting for another
+def load_clone_preview(practitioner_ids):
+    conn = create_connection()
     if conn:
         try:
-            with conn.cursor() as cursor:
-                # Fetch all holiday dates
-                cursor.execute("SELECT holiday_date FROM planning1.statutory_holidays;")
-                holidays = {row[0] for row in cursor.fetchall()}
-
-                # Identify the latest week with target data
-                latest_week_query = """
-                SELECT target_date
-                FROM planning1.target_update
-                ORDER BY target_date DESC
-                LIMIT 1;
-                """
-                cursor.execute(latest_week_query)
-                latest_target_date = cursor.fetchone()
-
-                if not latest_target_date:
-                    st.warning("No past target data available to clone.")
-                    return
-
-                latest_target_date = latest_target_date[0]
-                latest_start_date = latest_target_date - timedelta(days=latest_target_date.weekday())
-                latest_end_date = latest_start_date + timedelta(days=6)  # Full week (Mon-Sun)
-
-                # Fetch target data from the latest available week (Mon-Sun)
-                fetch_query = """
-                SELECT practitioner_id, practitioner_name, target_date, target_hour
-                FROM planning1.target_update
-                WHERE target_date BETWEEN %s AND %s;
-                """
-                cursor.execute(fetch_query, (latest_start_date, latest_end_date))
-                past_targets = cursor.fetchall()
-
-                if not past_targets:
-                    st.warning("No targets found in the latest week to clone.")
-                    return
-
-                # Organize past target data into a preview table
-                past_targets_dict = {}
-                for row in past_targets:
-                    practitioner_id, practitioner_name, target_date, target_hour = row
-                    weekday = target_date.strftime('%A')
-                    if practitioner_name not in past_targets_dict:
-                        past_targets_dict[practitioner_name] = {}
-                    past_targets_dict[practitioner_name][weekday] = target_hour
-
-                # Create a DataFrame for preview
-                days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                preview_data = []
-
-                for practitioner in practitioners_list:
-                    practitioner_name = practitioner['practitioner_name']
-                    row = [past_targets_dict.get(practitioner_name, {}).get(day, "") for day in days_of_week]
-                    preview_data.append([practitioner_name] + row)
-
-                # Build the preview DataFrame
-                preview_df = pd.DataFrame(preview_data, columns=["Practitioner"] + days_of_week)
-
-                # Display the preview DataFrame
-                st.subheader("Preview of Target Data to be Cloned")
-                st.table(preview_df)
-
-                # Confirm cloning action
-                if st.button("Submit Clone Targets"):
-                    date = start_date
-                    while date <= end_date:
-                        weekday = date.strftime('%A')
-                        if weekday in days_of_week:
-                            for practitioner in practitioners_list:
-                                practitioner_id = int(practitioner['practitioner_id'])
-                                practitioner_name = practitioner['practitioner_name']
-
-                                if date in holidays:
-                                    holidays_skipped.append(date)
-                                    continue
-
-                                # Check if a record already exists for this date
-                                check_query = """
-                                SELECT COUNT(*) FROM planning1.target_update
-                                WHERE practitioner_id = %s AND target_date = %s;
-                                """
-                                cursor.execute(check_query, (practitioner_id, date))
-                                record_exists = cursor.fetchone()[0]
-
-                                if record_exists > 0:
-                                    conflicts_found = True
-                                    continue
-
-                                # Get target hour from the latest week data
-                                target_hour = past_targets_dict.get(practitioner_name, {}).get(weekday, None)
-
-                                if target_hour is not None:
-                                    # Insert cloned target
-                                    insert_query = """
-                                    INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
-                                    VALUES (%s, %s, %s, %s, %s);
-                                    """
-                                    cursor.execute(insert_query, (practitioner_id, practitioner_name, date, target_hour, datetime.now()))
-                                    records_cloned += 1
-                        date += timedelta(days=1)
-                    conn.commit()
-
-                # Display messages based on the results
-                if holidays_skipped:
-                    skipped_dates = ', '.join([date.strftime("%Y-%m-%d") for date in holidays_skipped])
-                    st.info(f"The following dates were skipped due to statutory holidays: {skipped_dates}")
-                if conflicts_found:
-                    st.error("Some dates already have existing targets. Please use the Edit tab to modify existing records.")
-                elif records_cloned > 0:
-                    st.success(f"Cloned target hours successfully for {records_cloned} days!")
-                else:
-                    st.warning("No new targets were cloned. Please check the selected period or existing targets.")
+            return ops.preview_clone(conn, practitioner_ids)
         except Exception as e:
-            st.error(f"Failed to clone target hours: {e}")
+            st.error(f"Failed to preview the latest week: {e}")
         finally:
-            conn.close()
+            release_connection(conn)
+    return None
 
+# Cloning function
+def clone_target_updates_with_preview(practitioners_list, start_date, end_date):
+    practitioner_ids = [practitioner['practitioner_id'] for practitioner in practitioners_list]
+
+    # Preview the latest available week (Mon-Sun) per practitioner
+    preview_df = load_clone_preview(practitioner_ids)
+    if preview_df is None:
+        return
+
+    if preview_df.empty or preview_df['week_start'].isna().all():
+        st.warning("No past target data available to clone.")
+        return
+    if preview_df[DAYS_OF_WEEK].isna().all().all():
+        st.warning("No targets found in the latest week to clone.")
+        return
+
+    # Display the source week; the plan below shows the targets and hours the clone will actually
+    # insert, after existing targets and statutory holidays
+    preview_df = preview_df.rename(columns={'practitioner_name': 'Practitioner'})
+    st.subheader("Preview of Target Data to be Cloned")
+    st.table(preview_df[["Practitioner"] + DAYS_OF_WEEK].fillna(""))
+
+    # Plan the clone from the previewed week; nothing is written until the plan is confirmed
+    week_start = preview_df['week_start'].iloc[0]
+    plan_key = ("clone", tuple(practitioner_ids), start_date, end_date, str(week_start))
+    if st.button("Plan Clone Targets"):
+        plan_targets(plan_key, ops.plan_clone_targets, practitioner_ids, start_date, end_date, week_start)
+    show_target_plan(
+        plan_key,
+        "Cloned target hours successfully for {count} days!",
+        "No new targets to clone. Please check the selected period or existing targets."
+    )
+
+# Clone section of the Set tab, in a fragment so previewing, planning and confirming a clone only rerun this section
+@traced_fragment
+def clone_latest_week_panel(selected_practitioners, start_date, end_date):
+    # Clone the latest week instead of typing hours; the preview queries only run when asked for
+    st.subheader("Clone Latest Week")
+    if st.checkbox("Preview the latest week for the selected practitioners", key="clone_preview"):
+        if selected_practitioners:
+            clone_target_updates_with_preview(selected_practitioners, start_date, end_date)
+        else:
+            st.warning("No practitioners found for the selected criteria.")
 
 
-# Update target_hour in the database
+# Update target_hour in the database in chunks; returns the number of rows updated
 def update_target_hours(updates):
     conn = create_connection()
     if conn:
         try:
-            with conn.cursor() as cursor:
-                # Prepare the SQL query for batch execution
-                query = """
-                UPDATE planning1.target_update
-                SET target_hour = %s, updated_at = %s
-                WHERE practitioner_id = %s AND target_date = %s;
-                """
-
-                # Convert updates to a list of tuples for batch execution
-                update_values = [
-                    (float(update['target_hour']), datetime.now(), int(update['practitioner_id']), update['target_date'])
-                    for update in updates
-                ]
-
-                # Execute the batch update
-                cursor.executemany(query, update_values)
-                conn.commit()
-                # st.success("Target hours updated successfully!")
+            updated = ops.update_target_hours(conn, updates).rows_updated
+            after_target_write()
+            return updated
         except psycopg2.errors.UniqueViolation:
             st.error("Duplicate entry detected. Please ensure there are no conflicting records.")
         except Exception as e:
             st.error(f"Failed to update target hours: {e}")
         finally:
-            conn.close()
-
-# Plot target hours by matplotlib in batch
-def plot_target_hours_matplotlib(consolidated_df):
-    # Ensure the target_date column is in datetime format
-    consolidated_df['target_date'] = pd.to_datetime(consolidated_df['target_date'])
-
-    # Sort the DataFrame by practitioner_name and target_date
-    consolidated_df.sort_values(by=['practitioner_name', 'target_date'], inplace=True)
-
-    # Create the plot
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    # Iterate over unique practitioner names and plot each separately
-    for practitioner_name in consolidated_df['practitioner_name'].unique():
-        # Filter data for the current practitioner
-        practitioner_data = consolidated_df[consolidated_df['practitioner_name'] == practitioner_name]
-
-        # Plot the data with a unique line for each practitioner
-        ax.plot(
-            practitioner_data['target_date'],
-            practitioner_data['target_hour'],
-            marker='o',
-            linestyle='-',
-            label=practitioner_name
-        )
-
-    # Set title and labels
-    ax.set_title("Target Hours Over Time for Selected Practitioners")
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Target Hour")
-
-    # Format x-axis dates
-    ax.xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%Y-%m-%d'))
-    plt.xticks(rotation=45)
-
-    # Display grid for better readability
-    ax.grid(True, linestyle='--', alpha=0.6)
+            release_connection(conn)
+    return 0
 
-    # Add a legend to distinguish lines for different practitioners
-    ax.legend(title="Practitioner")
-
-    # Show the plot
-    st.pyplot(fig)
+# Set the same target_hour for every existing target of a group in a date range, entirely on the server
+def update_target_hours_range(practitioner_ids, start_date, end_date, target_hour):
+    conn = create_connection()
+    if conn:
+        try:
+            updated = ops.update_target_hours_range(conn, practitioner_ids, start_date, end_date, target_hour).rows_updated
+            after_target_write()
+            return updated
+        except Exception as e:
+            st.error(f"Failed to update target hours: {e}")
+        finally:
+            release_connection(conn)
+    return 0
+
+# Render the history chart to PNG, cached by the query inputs and a fingerprint of the loaded targets
+# and of the roster columns the chart labels and groups by (the frames themselves are not hashed)
+@st.cache_data(max_entries=32, show_spinner=False)
+def render_target_chart(_consolidated_df, _practitioners_df, data_key, mode, resample_rule, point_budget):
+    lines, band, step = build_chart_frames(_consolidated_df, _practitioners_df, mode, resample_rule, point_budget)
+    fig = plot_target_chart(lines, band, mode)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue(), step
 
+# Plot target hours by matplotlib in batch
+def plot_target_hours_matplotlib(consolidated_df, practitioners_df, mode="Practitioner", resolution="Daily"):
+    # Identify the data cheaply so identical selections reuse the rendered figure
+    fingerprint = int(pd.util.hash_pandas_object(
+        consolidated_df[['practitioner_id', 'target_date', 'target_hour']], index=False
+    ).sum())
+    # Renamed or moved practitioners change the labels and groups, so their roster rows are part of the key
+    roster = practitioners_df.loc[
+        practitioners_df['practitioner_id'].isin(consolidated_df['practitioner_id'].unique()),
+        ['practitioner_id', 'practitioner_name', 'clinic_location', 'manager_name'],
+    ]
+    roster_fingerprint = int(pd.util.hash_pandas_object(roster, index=False).sum())
+    data_key = (len(consolidated_df), fingerprint, roster_fingerprint)
+
+    png, step = render_target_chart(
+        consolidated_df, practitioners_df, data_key, mode, RESAMPLE_RULES[resolution], CHART_POINT_BUDGET
+    )
+    st.image(png, use_container_width=True)
+    if step > 1:
+        st.caption(f"Chart downsampled: each point averages {step} consecutive periods.")
+
+# History chart with its mode and resolution choices, in a fragment: changing them redraws only the chart
+# from the frame already loaded, without querying the database
+@traced_fragment
+def target_chart_panel(consolidated_df, practitioners_df):
+    col1, col2 = st.columns(2)
+    with col1:
+        chart_mode = st.selectbox("Chart Mode", CHART_MODES, key="chart_mode")
+    with col2:
+        chart_resolution = st.selectbox("Resolution", list(RESAMPLE_RULES), key="chart_resolution")
+    plot_target_hours_matplotlib(consolidated_df, practitioners_df, chart_mode, chart_resolution)
 
 
 # Delete target updates from the database
 def delete_target_hours(deletion_records):
     """
     Delete target hours for individual records based on practitioner_id and target_date.
+    All selected rows are removed by a single statement; returns the number of rows deleted.
     """
     conn = create_connection()
     if conn:
         try:
-            with conn.cursor() as cursor:
-                query = "DELETE FROM planning1.target_update WHERE practitioner_id = %s AND target_date = %s;"
-                
-                # Convert records to a list of tuples for batch execution
-                delete_values = [
-                    (int(record['practitioner_id']), record['target_date'])
-                    for record in deletion_records
-                ]
-
-                # Execute batch deletion using executemany()
-                cursor.executemany(query, delete_values)
-                conn.commit()
-                st.success("Selected target hours deleted successfully!")
+            deleted = ops.delete_target_hours(conn, deletion_records).rows_deleted
+            after_target_write()
+            st.success(f"{deleted} selected target hour(s) deleted successfully!")
+            return deleted
         except psycopg2.Error as e:
             st.error(f"Failed to delete records: {e}")
         finally:
-            conn.close()
+            release_connection(conn)
+    return 0
 
 # Delete target hours in batches selected from Start - End date
 def delete_target_hours_batch(selected_practitioners, start_date, end_date):
     """
     Batch delete target hours for a group of practitioners based on date range.
+    The whole group is deleted in one statement and one transaction; returns the number of rows deleted.
     """
     conn = create_connection()
     if conn:
         try:
-            with conn.cursor() as cursor:
-                query = """
-                DELETE FROM planning1.target_update
-                WHERE practitioner_id = %s AND target_date BETWEEN %s AND %s;
-                """
+            practitioner_ids = [practitioner['practitioner_id'] for practitioner in selected_practitioners]
+            deleted = ops.delete_target_hours_range(conn, practitioner_ids, start_date, end_date).rows_deleted
+            after_target_write()
+            st.success(f"Batch deletion completed successfully for the entire team! {deleted} target hour(s) deleted.")
+            return deleted
+        except Exception as e:
+            st.error(f"Failed to delete target hours for the team: {e}")
+        finally:
+            release_connection(conn)
+    return 0
 
-                # Iterate through each practitioner in the selected group
-                for practitioner in selected_practitioners:
-                    practitioner_id = int(practitioner['practitioner_id'])
+# Load all statutory holiday dates
+def load_holidays():
+    conn = create_connection()
+    if conn:
+        try:
+            return ops.load_holidays(conn)
+        finally:
+            release_connection(conn)
+    return set()
 
-                    # Execute the delete query for the current practitioner
-                    cursor.execute(query, (practitioner_id, start_date, end_date))
-                    conn.commit()  # Commit after each deletion to ensure it is applied
+# Merge validated imported targets into the database through a COPY staging table
+def import_target_updates(valid_df, overwrite):
+    conn = create_connection()
+    if conn:
+        try:
+            with ops.transaction(conn):
+                inserted, updated = merge_targets(conn, valid_df, datetime.now(), overwrite=overwrite)
+            after_target_write()
+            skipped = len(valid_df) - inserted - updated
+            st.success(f"Imported {inserted} new target(s) and updated {updated} existing target(s).")
+            if skipped:
+                st.info(f"{skipped} row(s) already had targets and were left unchanged.")
+        except Exception as e:
+            st.error(f"Failed to import target hours: {e}")
+        finally:
+            release_connection(conn)
 
-            st.success("Batch deletion completed successfully for the entire team!")
+# Export filtered targets to CSV/Parquet bytes, streaming from the database in chunks. Exports over
+# EXPORT_MAX_ROWS are refused before anything is read, so the in-memory file stays bounded and nothing
+# is left on disk when an export fails.
+def export_target_updates(file_format, locations, managers, start_date, end_date):
+    conn = create_connection()
+    if conn:
+        try:
+            filters = dict(locations=locations, managers=managers, start_date=start_date, end_date=end_date)
+            row_count = count_export_rows(conn, **filters)
+            if row_count > EXPORT_MAX_ROWS:
+                st.error(
+                    f"This export has {row_count} rows, more than the {EXPORT_MAX_ROWS} that can be downloaded here. "
+                    "Narrow the selection or run `python targetgenerator/cli.py export`."
+                )
+                return None, 0
+            out_file = io.BytesIO()
+            if file_format == "Parquet":
+                rows_written = export_targets_parquet(conn, out_file, **filters)
+            else:
+                rows_written = export_targets_csv(conn, out_file, **filters)
+            return out_file.getvalue(), rows_written
         except Exception as e:
-            st.error(f"Failed to delete target hours for the team: {e}")
+            st.error(f"Failed to export target hours: {e}")
         finally:
-            conn.close()
+            release_connection(conn)
+    return None, 0
+
+# Number of finished reruns listed in the instrumentation panel
+RERUN_HISTORY_SIZE = 20
+
+# Admin-only sidebar panel with the queries and timings of the current rerun and the previous ones
+def show_instrumentation_panel():
+    trace = instrumentation.current_trace()
+    if trace is None or st.session_state["username"] not in instrumentation.INSTRUMENTATION_ADMINS:
+        return
+
+    record = trace.to_record()
+    with st.sidebar.expander("⏱ Performance"):
+        st.caption("This rerun so far")
+        col1, col2 = st.columns(2)
+        col1.metric("Rerun time", f"{record['total_ms']:.0f} ms")
+        col2.metric("DB time", f"{record['db_ms']:.0f} ms")
+        col1.metric("Round trips", record['round_trips'])
+        col2.metric("Rows", record['rows'])
+        col1.metric("Pool checkouts", record['checkouts'])
+        col2.metric("Pool wait", f"{record['checkout_ms']:.0f} ms")
+        if record['spans']:
+            st.dataframe(pd.DataFrame(record['spans']), hide_index=True)
+        if record['queries']:
+            st.dataframe(pd.DataFrame(record['queries']), hide_index=True)
+
+        history = st.session_state.get("rerun_history", [])
+        if history:
+            st.caption("Previous reruns")
+            st.dataframe(pd.DataFrame(history[::-1]), hide_index=True)
+
+# Keep a short summary of a finished rerun for the instrumentation panel
+def remember_rerun(trace):
+    record = trace.to_record()
+    summary = {key: record[key] for key in ('event', 'started_at', 'total_ms', 'db_ms', 'checkout_ms', 'round_trips', 'rows')}
+    summary['spans'] = ", ".join(f"{span['name']} {span['ms']:.0f} ms" for span in record['spans'])
+    history = st.session_state.setdefault("rerun_history", [])
+    history.append(summary)
+    del history[:-RERUN_HISTORY_SIZE]
+
+# Export filters and button, in a fragment: choosing locations, managers, dates and format only reruns this panel
+@traced_fragment
+def export_panel(lookup_df):
+    locations = st.multiselect(
+        "Select Location(s)",
+        lookup_df['clinic_location'].unique(),
+        default=lookup_df['clinic_location'].unique()
+    )
+    manager_options = lookup_df.loc[lookup_df['clinic_location'].isin(locations), 'manager_name'].unique()
+    managers = st.multiselect(
+        "Select Manager(s)",
+        manager_options,
+        default=manager_options
+    )
+
+    # Select date range
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Start Date")
+    with col2:
+        end_date = st.date_input("End Date")
+
+    file_format = st.radio("File Format", ["CSV", "Parquet"], horizontal=True)
+
+    if start_date > end_date:
+        st.error("End Date must be after Start Date.")
+    elif not locations or not managers:
+        st.warning("Please select at least one location and manager.")
+    elif st.button("Export"):
+        export_data, rows_written = export_target_updates(file_format, locations, managers, start_date, end_date)
+        if export_data is not None:
+            st.success(f"Exported {rows_written} target rows.")
+            suffix = ".parquet" if file_format == "Parquet" else ".csv"
+            st.download_button(
+                "Download Export",
+                export_data,
+                file_name=f"targets_{start_date}_{end_date}{suffix}",
+                mime="application/octet-stream"
+            )
 
 # Streamlit App
 def main():
@@ -553,8 +799,16 @@ def main():
 
     st.sidebar.title("🌟 Target Management")
     # Display Options for CRUD Operations
-    option = streamlit_menu()
+    with instrumentation.span("menu"):
+        option = streamlit_menu()
 
+    with instrumentation.span(f"tab:{option}"):
+        render_tab(option)
+
+    show_instrumentation_panel()
+
+# Render the page of the selected operation
+def render_tab(option):
     # Set Target Operation
     if option == "Set":
         st.header("Set Target")
@@ -564,48 +818,12 @@ def main():
         practitioners_df = load_practitioners()
 
         if not practitioners_df.empty:
-            # Multiselect for Location
-            locations = st.multiselect(
-                "Select Location(s)",
-                practitioners_df['clinic_location'].unique(),
-                default=practitioners_df['clinic_location'].unique()
-            )
-
-            # Filter practitioners based on selected locations
-            filtered_df = practitioners_df[practitioners_df['clinic_location'].isin(locations)]
-
-            # Multiselect for Manager (filtered based on selected locations)
-            managers = st.multiselect(
-                "Select Manager(s)",
-                filtered_df['manager_name'].unique(),
-                default=filtered_df['manager_name'].unique()
-            )
-
-            # Further filter practitioners based on selected managers
-            filtered_df = filtered_df[filtered_df['manager_name'].isin(managers)]
-
-            # Multiselect for Practitioner (filtered based on selected locations and managers)
-            practitioners = st.multiselect(
-                "Select Practitioner(s)",
-                filtered_df['practitioner_name'].unique(),
-                default=filtered_df['practitioner_name'].unique()
-            )
-
-            # Final list of selected practitioners
-            selected_practitioners = filtered_df[filtered_df['practitioner_name'].isin(practitioners)].to_dict('records')
-
-            # Display selection summary
-            if selected_practitioners:
-                st.success(f"{len(selected_practitioners)} practitioner(s) selected.")
-            else:
-                st.warning("No practitioners selected. Please adjust your filters.")
+            # Cached location/manager lookup lists
+            lookup_df = load_location_manager_lookup()
 
-            # Select date range
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input("Start Date")
-            with col2:
-                end_date = st.date_input("End Date")
+            # Filters and date range; the database is only read for the applied selection
+            practitioner_filter_panel("set", practitioners_df, lookup_df)
+            selected_practitioners, start_date, end_date = applied_filters("set")
 
             # Display current target
             st.subheader('Current Target Table')
@@ -632,14 +850,7 @@ def main():
         """,
         unsafe_allow_html=True
     )
-            if st.button("Refresh", key="refresh_button"):
-                # Clear cached data for the display_target_updates function to fetch the latest data
-                st.cache_data.clear()
-                # Display the consolidated table with the latest data (cleared cache)
-                display_target_updates(selected_practitioners, start_date, end_date)
-            else:
-                # Display the consolidated table without clearing cache (initial or non-refresh load)
-                display_target_updates(selected_practitioners, start_date, end_date)
+            target_table_panel(selected_practitioners, start_date, end_date)
 
             # Validate date range
             if start_date > end_date:
@@ -650,24 +861,41 @@ def main():
                 days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
                 target_hours = {}
 
-                for day in days_of_week:
-                    col1, col2 = st.columns([1, 2])
-                    with col1:
-                        day_selected = st.checkbox(day)
-                    if day_selected:
+                # The day choices are a form: they are only read (and planned) when "Plan Targets" is clicked
+                with st.form("set_target_hours"):
+                    for day in days_of_week:
+                        col1, col2 = st.columns([1, 2])
+                        with col1:
+                            day_selected = st.checkbox(day)
                         with col2:
-                            target_hours[day] = float(st.number_input(f"Target Hours for {day}", min_value=0.0, key=day))
-
-                # Submit button
-                if st.button("Submit"):
+                            day_hours = st.number_input(
+                                f"Target Hours for {day}", min_value=MIN_TARGET_HOUR, max_value=MAX_TARGET_HOUR, key=day
+                            )
+                        if day_selected:
+                            target_hours[day] = float(day_hours)
+                    plan_requested = st.form_submit_button("Plan Targets")
+
+                # Plan first: the outcome is computed in one read query and applied only after confirmation
+                plan_key = (
+                    "set",
+                    tuple(practitioner['practitioner_id'] for practitioner in selected_practitioners),
+                    start_date, end_date, tuple(sorted(target_hours.items())),
+                )
+                if plan_requested:
                     if not target_hours:
                         st.warning("Please select at least one day and specify target hours.")
                     elif not selected_practitioners:
                         st.warning("No practitioners found for the selected criteria.")
                     else:
-                        # Batch update for all selected practitioners
-                        insert_target_updates_batch(selected_practitioners, start_date, end_date, target_hours)
-                        # st.success("Target hours updated successfully for the selected group!")
+                        # Plan for all selected practitioners
+                        plan_targets(plan_key, ops.plan_set_targets, selected_practitioners, start_date, end_date, target_hours)
+                show_target_plan(
+                    plan_key,
+                    "Target hours set successfully for {count} days!",
+                    "No new targets to set. Please use the Edit tab to modify existing targets."
+                )
+
+                clone_latest_week_panel(selected_practitioners, start_date, end_date)
         else:
             st.warning("No practitioners found in the database.")
 
@@ -682,48 +910,12 @@ def main():
         practitioners_df = load_practitioners()
 
         if not practitioners_df.empty:
-            # Multiselect for Location
-            locations = st.multiselect(
-                "Select Location(s)",
-                practitioners_df['clinic_location'].unique(),
-                default=practitioners_df['clinic_location'].unique()
-            )
-
-            # Filter practitioners based on selected locations
-            filtered_df = practitioners_df[practitioners_df['clinic_location'].isin(locations)]
-
-            # Multiselect for Manager (filtered based on selected locations)
-            managers = st.multiselect(
-                "Select Manager(s)",
-                filtered_df['manager_name'].unique(),
-                default=filtered_df['manager_name'].unique()
-            )
-
-            # Further filter practitioners based on selected managers
-            filtered_df = filtered_df[filtered_df['manager_name'].isin(managers)]
-
-            # Multiselect for Practitioner (filtered based on selected locations and managers)
-            practitioners = st.multiselect(
-                "Select Practitioner(s)",
-                filtered_df['practitioner_name'].unique(),
-                default=filtered_df['practitioner_name'].unique()
-            )
+            # Cached location/manager lookup lists
+            lookup_df = load_location_manager_lookup()
 
-            # Final list of selected practitioners
-            selected_practitioners = filtered_df[filtered_df['practitioner_name'].isin(practitioners)].to_dict('records')
-
-            # Display selection summary
-            if selected_practitioners:
-                st.success(f"{len(selected_practitioners)} practitioner(s) selected.")
-            else:
-                st.warning("No practitioners selected. Please adjust your filters.")
-
-            # Select date range
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input("Start Date")
-            with col2:
-                end_date = st.date_input("End Date")
+            # Filters and date range; the database is only read for the applied selection
+            practitioner_filter_panel("view", practitioners_df, lookup_df)
+            selected_practitioners, start_date, end_date = applied_filters("view")
 
             
             # Display current target
@@ -751,15 +943,7 @@ def main():
         """,
         unsafe_allow_html=True
     )
-            # Refresh button
-            if st.button("Refresh", key="refresh_button"):
-                # Clear cached data for the display_target_updates function to fetch the latest data
-                st.cache_data.clear()
-                # Display the consolidated table with the latest data (cleared cache)
-                display_target_updates(selected_practitioners, start_date, end_date)
-            else:
-                # Display the consolidated table without clearing cache (initial or non-refresh load)
-                display_target_updates(selected_practitioners, start_date, end_date)
+            target_table_panel(selected_practitioners, start_date, end_date, use_snapshot=True, refresh_app=True)
 
 
             # View History
@@ -768,21 +952,12 @@ def main():
                 st.error("End Date must be after Start Date.")
             else:
                 # Consolidate data for all selected practitioners
-                consolidated_df = pd.DataFrame()
-                
-                for practitioner in selected_practitioners:
-                    practitioner_id = practitioner['practitioner_id']
-                    practitioner_name = practitioner['practitioner_name']
-                    target_updates_df = load_target_updates(practitioner_id, start_date, end_date)
-
-                    if not target_updates_df.empty:
-                        # Add practitioner's details to the DataFrame
-                        target_updates_df['practitioner_name'] = practitioner_name
-                        consolidated_df = pd.concat([consolidated_df, target_updates_df], ignore_index=True)
+                practitioner_ids = [practitioner['practitioner_id'] for practitioner in selected_practitioners]
+                consolidated_df = load_view_target_updates(practitioner_ids, start_date, end_date)
 
                 # Plot the target hours if data is available
                 if not consolidated_df.empty:
-                    plot_target_hours_matplotlib(consolidated_df)
+                    target_chart_panel(consolidated_df, practitioners_df)
                 else:
                     st.warning("No target data available for the selected period.")
 
@@ -798,48 +973,12 @@ def main():
         practitioners_df = load_practitioners()
 
         if not practitioners_df.empty:
-            # Multiselect for Location
-            locations = st.multiselect(
-                "Select Location(s)",
-                practitioners_df['clinic_location'].unique(),
-                default=practitioners_df['clinic_location'].unique()
-            )
-
-            # Filter practitioners based on selected locations
-            filtered_df = practitioners_df[practitioners_df['clinic_location'].isin(locations)]
-
-            # Multiselect for Manager (filtered based on selected locations)
-            managers = st.multiselect(
-                "Select Manager(s)",
-                filtered_df['manager_name'].unique(),
-                default=filtered_df['manager_name'].unique()
-            )
-
-            # Further filter practitioners based on selected managers
-            filtered_df = filtered_df[filtered_df['manager_name'].isin(managers)]
-
-            # Multiselect for Practitioner (filtered based on selected locations and managers)
-            practitioners = st.multiselect(
-                "Select Practitioner(s)",
-                filtered_df['practitioner_name'].unique(),
-                default=filtered_df['practitioner_name'].unique()
-            )
+            # Cached location/manager lookup lists
+            lookup_df = load_location_manager_lookup()
 
-            # Final list of selected practitioners
-            selected_practitioners = filtered_df[filtered_df['practitioner_name'].isin(practitioners)].to_dict('records')
-
-            # Display selection summary
-            if selected_practitioners:
-                st.success(f"{len(selected_practitioners)} practitioner(s) selected.")
-            else:
-                st.warning("No practitioners selected. Please adjust your filters.")
-
-            # Select date range
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input("Start Date")
-            with col2:
-                end_date = st.date_input("End Date")
+            # Filters and date range; the database is only read for the applied selection
+            practitioner_filter_panel("edit", practitioners_df, lookup_df)
+            selected_practitioners, start_date, end_date = applied_filters("edit")
 
             
             # Display current target
@@ -867,31 +1006,15 @@ def main():
         """,
         unsafe_allow_html=True
     )
-            # Refresh button
-            if st.button("Refresh", key="refresh_button"):
-                # Clear cached data for the display_target_updates function to fetch the latest data
-                st.cache_data.clear()
-                # Display the consolidated table with the latest data (cleared cache)
-                display_target_updates(selected_practitioners, start_date, end_date)
-            else:
-                # Display the consolidated table without clearing cache (initial or non-refresh load)
-                display_target_updates(selected_practitioners, start_date, end_date)
+            target_table_panel(selected_practitioners, start_date, end_date, refresh_app=True)
             
             # Validate date range
             if start_date > end_date:
                 st.error("End Date must be after Start Date.")
             else:
                 # Load target updates for the selected group
-                consolidated_df = pd.DataFrame()
-
-                for practitioner in selected_practitioners:
-                    practitioner_id = practitioner['practitioner_id']
-                    practitioner_name = practitioner['practitioner_name']
-                    target_updates_df = load_target_updates(practitioner_id, start_date, end_date)
-
-                    if not target_updates_df.empty:
-                        target_updates_df['practitioner_name'] = practitioner_name
-                        consolidated_df = pd.concat([consolidated_df, target_updates_df], ignore_index=True)
+                practitioner_ids = [practitioner['practitioner_id'] for practitioner in selected_practitioners]
+                consolidated_df = load_target_updates_many(practitioner_ids, start_date, end_date)
 
                 # Check if there is data to edit
                 if not consolidated_df.empty:
@@ -899,48 +1022,57 @@ def main():
                     with st.expander("Click to edit target hours"):
                         st.write("Edit target hours below and click Submit Changes to save individual edits.")
 
-                        # Editable Data Table with Individual Changes Detection
-                        edited_df = consolidated_df.copy()
-                        updates = []
-
-                        # Collect individual target hour changes
-                        for i, row in edited_df.iterrows():
-                            new_target_hour = st.number_input(
-                                f"Target Hour for {row['target_date']} ({row['practitioner_name']})",
-                                min_value=0.0,
-                                value=row['target_hour'],
-                                key=f"edit_target_hour_{i}"
+                        # Editable grid backed by the consolidated frame; only target_hour can be changed.
+                        # It is a form, so edits stay in the browser until Submit Changes is clicked.
+                        with st.form("edit_target_form"):
+                            edited_df = st.data_editor(
+                                consolidated_df,
+                                column_config={
+                                    'target_hour': st.column_config.NumberColumn(
+                                        "target_hour", min_value=MIN_TARGET_HOUR, max_value=MAX_TARGET_HOUR
+                                    ),
+                                },
+                                disabled=['practitioner_id', 'practitioner_name', 'target_date'],
+                                hide_index=True,
+                                use_container_width=True,
+                                key="edit_target_grid"
                             )
-                            # Add change to updates list if target_hour is modified
-                            if new_target_hour != row['target_hour']:
-                                updates.append({
-                                    'practitioner_id': row['practitioner_id'],
-                                    'target_date': row['target_date'],
-                                    'target_hour': new_target_hour
-                                })
-
-                        # Submit Changes Button to save individual updates
-                        if st.button("Submit Changes"):
-                            if updates:
-                                update_target_hours(updates)
-                                st.success("Individual target hours updated successfully!")
+                            # Submit Changes Button to save individual updates
+                            submitted = st.form_submit_button("Submit Changes")
+
+                        if submitted:
+                            # Only the changed cells are sent to the database
+                            updates = ops.diff_target_hours(consolidated_df, edited_df)
+                            cleared = ops.cleared_target_hours(consolidated_df, edited_df)
+                            # Only the edited values are validated, so existing out-of-range targets do not block a save
+                            out_of_range = sum(
+                                not MIN_TARGET_HOUR <= update['target_hour'] <= MAX_TARGET_HOUR for update in updates
+                            )
+                            if out_of_range:
+                                st.error(f"{out_of_range} edited target hour(s) are outside {MIN_TARGET_HOUR:g}-{MAX_TARGET_HOUR:g}. No changes were saved.")
                             else:
-                                st.info("No individual changes made.")
+                                if updates:
+                                    updated = update_target_hours(updates)
+                                    if updated:
+                                        st.success(f"Individual target hours updated successfully for {updated} date(s)!")
+                                if cleared:
+                                    st.warning(f"{len(cleared)} cleared cell(s) were skipped and keep their target hours. Use the Delete tab to remove targets.")
+                                if not updates and not cleared:
+                                    st.info("No individual changes made.")
 
                     # Batch Update Section
                     st.subheader("Apply Same Target Hour to All Dates")
-                    batch_target_hour = st.number_input("Enter Target Hour for All Dates", min_value=0.0, key="batch_target_hour")
-                    if st.button("Apply All"):
-                        # Create batch updates for all dates in the selected range
-                        batch_updates = [{
-                            'practitioner_id': row['practitioner_id'],
-                            'target_date': row['target_date'],
-                            'target_hour': batch_target_hour
-                        } for _, row in edited_df.iterrows()]
-
-                        # Apply batch updates directly to the database
-                        update_target_hours(batch_updates)
-                        st.success("All dates updated successfully to the specified target hour!")
+                    with st.form("batch_target_form"):
+                        batch_target_hour = st.number_input(
+                            "Enter Target Hour for All Dates", min_value=MIN_TARGET_HOUR, max_value=MAX_TARGET_HOUR,
+                            key="batch_target_hour"
+                        )
+                        apply_all = st.form_submit_button("Apply All")
+                    if apply_all:
+                        # Update every date in the selected range on the server without shipping per-row values
+                        updated = update_target_hours_range(practitioner_ids, start_date, end_date, batch_target_hour)
+                        if updated:
+                            st.success(f"All {updated} dates updated successfully to the specified target hour!")
 
                 else:
                     st.warning("No target data available for the selected period.")
@@ -957,48 +1089,12 @@ def main():
         practitioners_df = load_practitioners()
 
         if not practitioners_df.empty:
-            # Multiselect for Location
-            locations = st.multiselect(
-                "Select Location(s)",
-                practitioners_df['clinic_location'].unique(),
-                default=practitioners_df['clinic_location'].unique()
-            )
-
-            # Filter practitioners based on selected locations
-            filtered_df = practitioners_df[practitioners_df['clinic_location'].isin(locations)]
-
-            # Multiselect for Manager (filtered based on selected locations)
-            managers = st.multiselect(
-                "Select Manager(s)",
-                filtered_df['manager_name'].unique(),
-                default=filtered_df['manager_name'].unique()
-            )
+            # Cached location/manager lookup lists
+            lookup_df = load_location_manager_lookup()
 
-            # Further filter practitioners based on selected managers
-            filtered_df = filtered_df[filtered_df['manager_name'].isin(managers)]
-
-            # Multiselect for Practitioner (filtered based on selected locations and managers)
-            practitioners = st.multiselect(
-                "Select Practitioner(s)",
-                filtered_df['practitioner_name'].unique(),
-                default=filtered_df['practitioner_name'].unique()
-            )
-
-            # Final list of selected practitioners
-            selected_practitioners = filtered_df[filtered_df['practitioner_name'].isin(practitioners)].to_dict('records')
-
-            # Display selection summary
-            if selected_practitioners:
-                st.success(f"{len(selected_practitioners)} practitioner(s) selected.")
-            else:
-                st.warning("No practitioners selected. Please adjust your filters.")
-
-            # Select date range
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input("Start Date")
-            with col2:
-                end_date = st.date_input("End Date")
+            # Filters and date range; the database is only read for the applied selection
+            practitioner_filter_panel("delete", practitioners_df, lookup_df)
+            selected_practitioners, start_date, end_date = applied_filters("delete")
 
             
             # Display current target
@@ -1026,31 +1122,15 @@ def main():
         """,
         unsafe_allow_html=True
     )
-            # Refresh button
-            if st.button("Refresh", key="refresh_button"):
-                # Clear cached data for the display_target_updates function to fetch the latest data
-                st.cache_data.clear()
-                # Display the consolidated table with the latest data (cleared cache)
-                display_target_updates(selected_practitioners, start_date, end_date)
-            else:
-                # Display the consolidated table without clearing cache (initial or non-refresh load)
-                display_target_updates(selected_practitioners, start_date, end_date)
+            target_table_panel(selected_practitioners, start_date, end_date, refresh_app=True)
             
             # Validate date range
             if start_date > end_date:
                 st.error("End Date must be after Start Date.")
             else:
                 # Consolidate target updates for the selected group
-                consolidated_df = pd.DataFrame()
-
-                for practitioner in selected_practitioners:
-                    practitioner_id = practitioner['practitioner_id']
-                    practitioner_name = practitioner['practitioner_name']
-                    target_updates_df = load_target_updates(practitioner_id, start_date, end_date)
-
-                    if not target_updates_df.empty:
-                        target_updates_df['practitioner_name'] = practitioner_name
-                        consolidated_df = pd.concat([consolidated_df, target_updates_df], ignore_index=True)
+                practitioner_ids = [practitioner['practitioner_id'] for practitioner in selected_practitioners]
+                consolidated_df = load_target_updates_many(practitioner_ids, start_date, end_date)
 
                 # Individual Delete Section
                 if not consolidated_df.empty:
@@ -1058,18 +1138,26 @@ def main():
                     with st.expander("Click to select dates for deletion"):
                         st.write("Select rows to delete and click 'Delete Selected Rows'.")
 
-                        # Add a checkbox for deletion selection
-                        deletion_records = []
-                        for i, row in consolidated_df.iterrows():
-                            delete_row = st.checkbox(f"Delete target hour for {row['target_date']} ({row['practitioner_name']}: {row['target_hour']} hours)", key=f"delete_{i}")
-                            if delete_row:
-                                deletion_records.append({
-                                    'practitioner_id': row['practitioner_id'],
-                                    'target_date': row['target_date']
-                                })
-
-                        # Delete button for individual rows
-                        if st.button("Delete Selected Rows"):
+                        # Selection grid: only the Delete column can be ticked. It is a form, so ticking
+                        # rows does not rerun the page; the selection is read when the delete is requested.
+                        selection_df = consolidated_df.copy()
+                        selection_df.insert(0, 'delete', False)
+                        with st.form("delete_target_form"):
+                            selected_df = st.data_editor(
+                                selection_df,
+                                column_config={
+                                    'delete': st.column_config.CheckboxColumn("Delete", default=False),
+                                },
+                                disabled=list(consolidated_df.columns),
+                                hide_index=True,
+                                use_container_width=True,
+                                key="delete_target_grid"
+                            )
+                            # Delete button for individual rows
+                            submitted = st.form_submit_button("Delete Selected Rows")
+
+                        if submitted:
+                            deletion_records = selected_df.loc[selected_df['delete'], ['practitioner_id', 'target_date']].to_dict('records')
                             if deletion_records:
                                 delete_target_hours(deletion_records)
                             else:
@@ -1087,8 +1175,63 @@ def main():
                     st.warning("No target data available for the selected period.")
         else:
             st.warning("No practitioners found in the database.")
+
+    elif option == "Import":
+        st.header("Import Target")
+        st.subheader("Upload a CSV or Excel File of Targets")
+        st.write("The file needs practitioner_id, target_date and target_hour columns.")
+
+        uploaded_file = st.file_uploader("Target File", type=["csv", "xlsx", "xls"])
+        if uploaded_file is not None:
+            try:
+                upload_df = read_target_file(uploaded_file, uploaded_file.name)
+                practitioners_df = load_practitioners()
+                valid_df, rejected_df = validate_targets(
+                    upload_df, practitioners_df.get('practitioner_id', []), load_holidays(), MIN_TARGET_HOUR, MAX_TARGET_HOUR
+                )
+            except Exception as e:
+                st.error(f"Failed to read the uploaded file: {e}")
+            else:
+                st.success(f"{len(valid_df)} valid row(s) ready to import.")
+                if not rejected_df.empty:
+                    st.warning(f"{len(rejected_df)} row(s) failed validation and will not be imported.")
+                    st.dataframe(rejected_df.head(1000))
+                    st.download_button(
+                        "Download Rejected Rows",
+                        rejected_df.to_csv(index=False),
+                        file_name="rejected_targets.csv",
+                        mime="text/csv"
+                    )
+
+                conflict_mode = st.radio(
+                    "Existing Targets",
+                    ["Skip existing targets", "Overwrite existing targets"],
+                    horizontal=True
+                )
+                if st.button("Import Targets"):
+                    if valid_df.empty:
+                        st.warning("No valid rows to import.")
+                    else:
+                        import_target_updates(valid_df, overwrite=conflict_mode == "Overwrite existing targets")
+
+    elif option == "Export":
+        st.header("Export Target")
+        st.subheader("Export Targets by Location, Manager and Date Range")
+
+        # Cached location/manager lookup lists
+        lookup_df = load_location_manager_lookup()
+
+        if not lookup_df.empty:
+            export_panel(lookup_df)
+        else:
+            st.warning("No practitioners found in the database.")
 # App flow
 if st.session_state["logged_in"]:
-    main()  # Call your main app here
+    with instrumentation.rerun(st.session_state["username"]) as trace:
+        try:
+            main()  # Call your main app here
+        finally:
+            if trace is not None:
+                remember_rerun(trace)
 else:
     show_login_page()
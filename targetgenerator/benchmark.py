@@ -0,0 +1,288 @@
+"""
+Benchmark the target generator's data operations against a synthetic organization.
+
+For every scale point (LOCATIONSxMANAGERSxPRACTITIONERS) the planning1 tables are replaced
+with a deterministic synthetic organization (see synthetic_org.py), then set, clone, view,
+edit, delete and export are timed on one location's practitioners. Writes run as dry runs,
+so every repetition sees the same data. Results (p50/p95 and database round trips per
+operation) are printed and saved as JSON so runs can be compared over time.
+
+The target database is wiped: it must be named explicitly and should be a local scratch copy
+with Database/Create.sql applied.
+
+Example:
+    python targetgenerator/benchmark.py --dbname targets_bench --scale 5x20x200 --scale 50x250x5000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import psycopg2
+from psycopg2 import extensions
+
+import db
+import target_operations as ops
+from synthetic_org import DEFAULT_HOLIDAYS, OrgSpec, load_org
+from target_export import export_targets_csv
+from target_schedule import DAYS_OF_WEEK
+
+DEFAULT_SCALES = ["5x20x200", "20x80x1000", "50x250x5000"]
+OPERATIONS = ("set", "clone", "view", "edit", "delete", "export")
+
+# Every n-th row of the viewed frame is edited or deleted
+EDIT_EVERY = 10
+
+
+# Cursor that counts statements sent to the server on its connection
+class CountingCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        self.connection.round_trips += 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        self.connection.round_trips += len(vars_list)
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        self.connection.round_trips += 1
+        return super().copy_expert(sql, file, size)
+
+    # Fetches from a named (server-side) cursor each go to the server
+    def fetchone(self):
+        if self.name:
+            self.connection.round_trips += 1
+        return super().fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        if self.name:
+            self.connection.round_trips += 1
+        return super().fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        if self.name:
+            self.connection.round_trips += 1
+        return super().fetchall()
+
+
+# Connection that counts round trips, including commit and rollback of an open transaction
+class CountingConnection(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+        self.cursor_factory = CountingCursor
+
+    def commit(self):
+        if self.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self.round_trips += 1
+        return super().commit()
+
+    def rollback(self):
+        if self.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self.round_trips += 1
+        return super().rollback()
+
+
+def parse_scale(value):
+    try:
+        locations, managers, practitioners = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected LOCATIONSxMANAGERSxPRACTITIONERS, got {value!r}")
+    return locations, managers, practitioners
+
+
+def parse_holiday(value):
+    month_day, _, name = value.partition("=")
+    try:
+        date(2000, int(month_day[:2]), int(month_day[3:]))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected MM-DD[=name], got {value!r}")
+    return month_day, name or "Holiday"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark target generator operations on synthetic data.")
+    parser.add_argument("--dbname", required=True, help="Scratch database to load (its planning1 data is replaced)")
+    parser.add_argument("--scale", action="append", type=parse_scale, metavar="LxMxP",
+                        help=f"Locations x managers x practitioners (repeatable, default: {' '.join(DEFAULT_SCALES)})")
+    parser.add_argument("--history-years", type=int, default=3, help="Years of target history (default: 3)")
+    parser.add_argument("--first-year", type=int, default=2023, help="First year of history (default: 2023)")
+    parser.add_argument("--holiday", action="append", type=parse_holiday, metavar="MM-DD[=NAME]",
+                        help="Statutory holiday (repeatable, default: a fixed Canadian calendar)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic data (default: 42)")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per operation (default: 10)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per operation (default: 1)")
+    parser.add_argument("--operation", action="append", choices=OPERATIONS,
+                        help="Operation to run (repeatable, default: all)")
+    parser.add_argument("--output", help="JSON results file (default: benchmark-<timestamp>.json)")
+    return parser
+
+
+def connect(dbname):
+    settings = db.connection_settings()
+    settings['dbname'] = dbname
+    return psycopg2.connect(connection_factory=CountingConnection, **settings)
+
+
+# Build the operations for one loaded organization; each returns the number of rows it touched
+def build_operations(conn, spec):
+    roster_df = ops.load_roster(conn)
+    selection_df = ops.filter_roster(roster_df, locations=[roster_df['clinic_location'].min()])
+    practitioners = selection_df[['practitioner_id', 'practitioner_name']].to_dict('records')
+    practitioner_ids = selection_df['practitioner_id'].tolist()
+
+    next_start, next_end = date(spec.next_year, 1, 1), date(spec.next_year, 12, 31)
+    view_start, view_end = date(spec.next_year - 1, 1, 1), date(spec.next_year - 1, 12, 31)
+    weekday_hours = {day: 7.0 for day in DAYS_OF_WEEK[:5]}
+
+    viewed_df = ops.load_target_updates_many(conn, practitioner_ids, view_start, view_end)
+    edited_df = viewed_df.copy()
+    edited_df.loc[edited_df.index[::EDIT_EVERY], 'target_hour'] += 0.5
+    deletions = viewed_df.iloc[::EDIT_EVERY][['practitioner_id', 'target_date']].to_dict('records')
+    conn.rollback()
+
+    # Set and clone are timed the way the app runs them: plan, then apply the plan (rolled back)
+    def run_set():
+        plan = ops.plan_set_targets(conn, practitioners, next_start, next_end, weekday_hours)
+        return ops.apply_plan(conn, plan, dry_run=True).records_inserted
+
+    def run_clone():
+        plan = ops.plan_clone_targets(conn, practitioner_ids, next_start, next_end)
+        return ops.apply_plan(conn, plan, dry_run=True).records_inserted
+
+    def run_view():
+        rows = len(ops.load_target_updates_many(conn, practitioner_ids, view_start, view_end))
+        conn.rollback()
+        return rows
+
+    def run_edit():
+        updates = ops.diff_target_hours(viewed_df, edited_df)
+        return ops.update_target_hours(conn, updates, dry_run=True).rows_updated
+
+    def run_delete():
+        return ops.delete_target_hours(conn, deletions, dry_run=True).rows_deleted
+
+    def run_export():
+        with open(os.devnull, 'wb') as out_file:
+            rows = export_targets_csv(conn, out_file, start_date=view_start, end_date=view_end)
+        conn.rollback()
+        return rows
+
+    operations = {
+        'set': run_set,
+        'clone': run_clone,
+        'view': run_view,
+        'edit': run_edit,
+        'delete': run_delete,
+        'export': run_export,
+    }
+    return operations, len(practitioner_ids)
+
+
+def time_operation(conn, operation, repeat, warmup):
+    for _ in range(warmup):
+        operation()
+
+    samples, round_trips, rows = [], [], None
+    for _ in range(repeat):
+        conn.round_trips = 0
+        started = time.perf_counter()
+        rows = operation()
+        samples.append(time.perf_counter() - started)
+        round_trips.append(conn.round_trips)
+
+    samples_ms = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 3),
+        'round_trips': int(np.median(round_trips)),
+        'rows': int(rows),
+        'samples_ms': [round(float(sample), 3) for sample in samples_ms],
+    }
+
+
+def run_scale(conn, spec, operation_names, repeat, warmup):
+    print(f"Scale {spec.label}: loading synthetic organization...", flush=True)
+    started = time.perf_counter()
+    target_rows = load_org(conn, spec)
+    load_seconds = time.perf_counter() - started
+    print(f"  {target_rows} target row(s) loaded in {load_seconds:.1f}s")
+
+    operations, selection_size = build_operations(conn, spec)
+    results = {}
+    for name in operation_names:
+        results[name] = time_operation(conn, operations[name], repeat, warmup)
+        print(f"  {name:<8} p50 {results[name]['p50_ms']:10.1f} ms  p95 {results[name]['p95_ms']:10.1f} ms  "
+              f"{results[name]['round_trips']:>4} round trip(s)  {results[name]['rows']:>8} row(s)", flush=True)
+
+    return {
+        'scale': {
+            'locations': spec.locations,
+            'managers': spec.managers,
+            'practitioners': spec.practitioners,
+            'history_years': spec.history_years,
+            'target_rows': target_rows,
+            'selected_practitioners': selection_size,
+        },
+        'load_seconds': round(load_seconds, 3),
+        'operations': results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scales = args.scale or [parse_scale(value) for value in DEFAULT_SCALES]
+    holidays = dict(args.holiday) if args.holiday else dict(DEFAULT_HOLIDAYS)
+    operation_names = args.operation or list(OPERATIONS)
+    started_at = datetime.now()
+
+    conn = connect(args.dbname)
+    try:
+        results = [
+            run_scale(
+                conn,
+                OrgSpec(locations, managers, practitioners, args.first_year, args.history_years, holidays, args.seed),
+                operation_names, args.repeat, args.warmup,
+            )
+            for locations, managers, practitioners in scales
+        ]
+    finally:
+        conn.close()
+
+    report = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'settings': {
+            'seed': args.seed,
+            'first_year': args.first_year,
+            'history_years': args.history_years,
+            'holidays': holidays,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+        },
+        'results': results,
+    }
+    output = args.output or f"benchmark-{started_at:%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Headless batch jobs for the target generator, for use from cron or a shell.
+
+Examples:
+    python targetgenerator/cli.py set --start 2026-01-01 --end 2026-12-31 --hours Monday=7 --hours Friday=6
+    python targetgenerator/cli.py clone --location Downtown --start 2026-01-01 --end 2026-12-31 --dry-run
+    python targetgenerator/cli.py purge --manager "Jane Doe" --start 2020-01-01 --end 2020-12-31
+    python targetgenerator/cli.py rollover --start 2027-01-01 --end 2027-12-31 --workers 8 --create-partitions
+    python targetgenerator/cli.py sync-dim
+    python targetgenerator/cli.py sync-facts
+    python targetgenerator/cli.py refresh-rollups
+    python targetgenerator/cli.py export --location Downtown --start 2026-01-01 --end 2026-12-31 --output targets.csv
+"""
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import db
+import target_operations as ops
+from dim_practitioner import sync_dim_practitioner
+from fact_etl import sync_fact_targets
+from rollover import SHARD_COLUMNS, run_rollover
+from rollups import refresh_rollups
+from target_export import export_targets_csv, export_targets_parquet
+from target_schedule import DAYS_OF_WEEK
+
+
+WAREHOUSE_COMMANDS = ("sync-dim", "sync-facts", "refresh-rollups")
+
+
+# Wall-clock time of each phase of a job
+class Timings:
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def summary(self):
+        lines = [f"  {name:<12} {seconds:8.3f}s" for name, seconds in self.phases]
+        lines.append(f"  {'total':<12} {sum(seconds for _, seconds in self.phases):8.3f}s")
+        return "\n".join(lines)
+
+
+def parse_weekday_hours(values):
+    target_hours = {}
+    for value in values:
+        day, _, hours = value.partition("=")
+        day = day.strip().capitalize()
+        try:
+            if day not in DAYS_OF_WEEK:
+                raise ValueError(day)
+            target_hours[day] = float(hours)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Expected <Weekday>=<hours>, got {value!r}")
+    return target_hours
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run target generator jobs without the Streamlit UI.")
+
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument("--location", action="append", default=[], help="Clinic location to include (repeatable)")
+    selection.add_argument("--manager", action="append", default=[], help="Manager to include (repeatable)")
+    selection.add_argument("--practitioner-id", action="append", type=int, default=[], help="Practitioner id to include (repeatable)")
+    selection.add_argument("--start", type=date.fromisoformat, required=True, help="Start date (YYYY-MM-DD)")
+    selection.add_argument("--end", type=date.fromisoformat, required=True, help="End date (YYYY-MM-DD), inclusive")
+    selection.add_argument("--dry-run", action="store_true", help="Run the job and report the outcome, then roll back")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    set_parser = subparsers.add_parser("set", parents=[selection], help="Set weekday target hours for a date range")
+    set_parser.add_argument("--hours", action="append", required=True, metavar="WEEKDAY=HOURS",
+                            help="Target hours for a weekday, e.g. Monday=7 (repeatable)")
+
+    subparsers.add_parser("clone", parents=[selection], help="Clone the latest week of targets onto a date range")
+    subparsers.add_parser("purge", parents=[selection], help="Delete all targets in a date range")
+
+    rollover_parser = subparsers.add_parser(
+        "rollover", parents=[selection], help="Clone the latest week onto a new period in parallel shards"
+    )
+    rollover_parser.add_argument("--shard-by", choices=sorted(SHARD_COLUMNS), default="location",
+                                 help="Roster column used to split the work (default: location)")
+    rollover_parser.add_argument("--workers", type=int, default=4, help="Shards run concurrently (default: 4)")
+    rollover_parser.add_argument("--retries", type=int, default=2, help="Retries per shard on transient errors (default: 2)")
+    rollover_parser.add_argument("--create-partitions", action="store_true",
+                                 help="Create the yearly target_update partitions for the period first")
+
+    dim_parser = subparsers.add_parser(
+        "sync-dim", help="Version changed practitioners into model.Dim_Practitioner (SCD type 2)"
+    )
+    dim_parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                            help="Effective date of the new versions (YYYY-MM-DD, default: today)")
+    dim_parser.add_argument("--dry-run", action="store_true", help="Run the job and report the outcome, then roll back")
+
+    sync_parser = subparsers.add_parser(
+        "sync-facts", help="Load target hours changed since the last run into model.Fact_Performance"
+    )
+    sync_parser.add_argument("--full", action="store_true", help="Reload every target row instead of only changed ones")
+    sync_parser.add_argument("--dry-run", action="store_true", help="Run the job and report the outcome, then roll back")
+
+    rollup_parser = subparsers.add_parser(
+        "refresh-rollups", help="Rebuild the dashboard rollup periods affected by changed facts"
+    )
+    rollup_parser.add_argument("--full", action="store_true", help="Rebuild every period")
+    rollup_parser.add_argument("--dry-run", action="store_true", help="Run the job and report the outcome, then roll back")
+
+    export_parser = subparsers.add_parser("export", help="Stream targets to a CSV or Parquet file of any size")
+    export_parser.add_argument("--location", action="append", default=[], help="Clinic location to include (repeatable)")
+    export_parser.add_argument("--manager", action="append", default=[], help="Manager to include (repeatable)")
+    export_parser.add_argument("--start", type=date.fromisoformat, default=None, help="Start date (YYYY-MM-DD)")
+    export_parser.add_argument("--end", type=date.fromisoformat, default=None, help="End date (YYYY-MM-DD), inclusive")
+    export_parser.add_argument("--output", required=True, help="File to write; a .parquet suffix selects Parquet, anything else CSV")
+    return parser
+
+
+# Jobs on the reporting model; they do not take a practitioner selection or date range
+def run_warehouse_job(args, timings):
+    with timings.phase("connect"):
+        conn = db.connect()
+    prefix = "[dry run] " if args.dry_run else ""
+    try:
+        with timings.phase(args.command):
+            if args.command == "sync-dim":
+                result = sync_dim_practitioner(conn, as_of=args.as_of, dry_run=args.dry_run)
+                print(f"{prefix}{result.practitioners_added} practitioner(s) added, {result.practitioners_changed} versioned, "
+                      f"{result.practitioners_removed} closed, effective {result.as_of:%Y-%m-%d}.")
+            elif args.command == "sync-facts":
+                result = sync_fact_targets(conn, full_reload=args.full, dry_run=args.dry_run)
+                print(f"{prefix}{result.rows_changed} changed target(s) read, {result.rows_loaded} fact row(s) upserted, "
+                      f"{result.rows_cleared} stale fact target(s) cleared, "
+                      f"{result.rows_unresolved} without a Dim_Practitioner version with a location on their date.")
+                print(f"High-water mark: {result.high_water_mark}")
+            elif args.command == "refresh-rollups":
+                result = refresh_rollups(conn, full_rebuild=args.full, dry_run=args.dry_run)
+                print(f"{prefix}{result.rows_written} rollup row(s) rebuilt.")
+    finally:
+        conn.close()
+    return 0
+
+
+# Export straight from the database to a file, without the in-app size limit
+def run_export_job(args, timings):
+    with timings.phase("connect"):
+        conn = db.connect()
+    try:
+        with timings.phase("export"), open(args.output, "wb") as out_file:
+            filters = dict(locations=args.location, managers=args.manager, start_date=args.start, end_date=args.end)
+            if args.output.endswith(".parquet"):
+                rows_written = export_targets_parquet(conn, out_file, **filters)
+            else:
+                rows_written = export_targets_csv(conn, out_file, **filters)
+    finally:
+        conn.close()
+    print(f"{rows_written} target row(s) written to {args.output}.")
+    return 0
+
+
+def run_rollover_job(args, timings, roster_df):
+    if args.create_partitions and not args.dry_run:
+        with timings.phase("partitions"):
+            conn = db.connect()
+            try:
+                ops.create_target_partitions(conn, args.start, args.end)
+            finally:
+                conn.close()
+
+    with timings.phase("rollover"):
+        report = run_rollover(
+            roster_df, args.start, args.end, args.shard_by, args.workers, args.retries, args.dry_run
+        )
+    if report.source_week_start is None:
+        print("No past target data available to clone.")
+        return 1
+
+    prefix = "[dry run] " if args.dry_run else ""
+    print(f"Source week starting {report.source_week_start:%Y-%m-%d}, {len(report.shards)} shard(s):")
+    for shard in report.shards:
+        if shard.error:
+            outcome = f"FAILED after {shard.attempts} attempt(s): {shard.error}"
+        else:
+            outcome = (f"{shard.result.records_inserted} inserted, "
+                       f"{shard.result.records_planned - shard.result.records_inserted} already existed")
+        print(f"  {shard.shard:<30} {shard.practitioner_count:>5} practitioner(s) {shard.seconds:8.3f}s  {outcome}")
+    print(f"{prefix}{report.records_inserted} target(s) inserted, {report.conflicts} already existed, "
+          f"{len(report.holidays_skipped)} holiday date(s) skipped, {len(report.failed_shards)} shard(s) failed.")
+    return 1 if report.failed_shards else 0
+
+
+def run(args, timings):
+    if args.command in WAREHOUSE_COMMANDS:
+        return run_warehouse_job(args, timings)
+    if args.command == "export":
+        return run_export_job(args, timings)
+    if args.start > args.end:
+        raise ValueError("End date must be after start date.")
+
+    with timings.phase("connect"):
+        conn = db.connect()
+    try:
+        with timings.phase("roster"):
+            roster_df = ops.filter_roster(ops.load_roster(conn), args.location, args.manager, args.practitioner_id)
+        if roster_df.empty:
+            print("No practitioners matched the selection.")
+            return 1
+        print(f"{len(roster_df)} practitioner(s) selected.")
+        practitioner_ids = roster_df['practitioner_id'].tolist()
+
+        if args.command == "rollover":
+            return run_rollover_job(args, timings, roster_df)
+
+        if args.command in ("set", "clone"):
+            # Same path as the app: plan, then apply exactly that plan; a dry run stops after planning
+            with timings.phase("plan"):
+                if args.command == "set":
+                    result = ops.plan_set_targets(
+                        conn, roster_df.to_dict('records'), args.start, args.end, parse_weekday_hours(args.hours)
+                    )
+                else:
+                    result = ops.plan_clone_targets(conn, practitioner_ids, args.start, args.end)
+            if not args.dry_run:
+                with timings.phase(args.command):
+                    result = ops.apply_plan(conn, result)
+        else:
+            with timings.phase(args.command):
+                result = ops.delete_target_hours_range(conn, practitioner_ids, args.start, args.end, args.dry_run)
+    finally:
+        conn.close()
+
+    prefix = "[dry run] " if args.dry_run else ""
+    if isinstance(result, ops.TargetPlan):
+        print(f"{prefix}{result.records_to_insert} target(s) to insert, {result.conflicts} already existed, "
+              f"{len(result.holidays_skipped)} holiday date(s) skipped.")
+    elif isinstance(result, ops.InsertResult):
+        print(f"{prefix}{result.records_inserted} target(s) inserted, "
+              f"{result.records_planned - result.records_inserted} already existed, "
+              f"{len(result.holidays_skipped)} holiday date(s) skipped.")
+    else:
+        print(f"{prefix}{result.rows_deleted} target(s) deleted.")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    timings = Timings()
+    try:
+        status = run(args, timings)
+    except Exception as e:
+        print(f"Failed to run {args.command}: {e}", file=sys.stderr)
+        status = 2
+    print("Timing summary:")
+    print(timings.summary())
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
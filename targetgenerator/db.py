@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+# Need to register for online cloud to host the data here (can be overridden with environment variables)
+host = os.getenv("DB_HOST", "")
+dbname = os.getenv("DB_NAME", "")
+user = os.getenv("DB_USER", "")
+password = os.getenv("DB_PASSWORD", "")
+port = os.getenv("DB_PORT", "")
+
+# Connection pool settings (can be overridden with environment variables)
+POOL_MIN_CONNECTIONS = int(os.getenv("DB_POOL_MIN_CONNECTIONS", "1"))
+POOL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "10"))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "10"))  # seconds to wait for a free connection
+POOL_RECYCLE_SECONDS = float(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))  # reconnect connections older than this
+POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))  # health check connections idle longer than this
+
+# updated_at is stamped before a write commits, so rows can become visible behind the newest updated_at
+# a reader has already seen. Incremental readers (fact loader, target frames, local snapshot) recheck
+# this window before their high-water mark.
+UPDATED_AT_LOOKBACK = timedelta(minutes=10)
+
+
+def connection_settings():
+    return dict(host=host, dbname=dbname, user=user, password=password, port=port)
+
+
+# Open a dedicated connection (used by the CLI and batch jobs outside Streamlit)
+def connect():
+    return psycopg2.connect(**connection_settings())
+
+
+# Process-wide connection pool with checkout timeout, health checks and recycling
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, checkout_timeout, recycle_seconds, ping_idle_seconds, **connect_kwargs):
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._checkout_timeout = checkout_timeout
+        self._recycle_seconds = recycle_seconds
+        self._ping_idle_seconds = ping_idle_seconds
+        self._created_at = {}
+        self._released_at = {}
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        deadline = time.monotonic() + self._checkout_timeout
+        while True:
+            try:
+                conn = self._pool.getconn()
+            except pool.PoolError:
+                # Pool exhausted: wait for another session to return a connection
+                if time.monotonic() >= deadline:
+                    raise pool.PoolError(f"No database connection available after {self._checkout_timeout:.0f}s")
+                time.sleep(0.05)
+                continue
+
+            now = time.monotonic()
+            with self._lock:
+                created_at = self._created_at.setdefault(id(conn), now)
+                released_at = self._released_at.get(id(conn), now)
+
+            if now - created_at > self._recycle_seconds or not self._is_healthy(conn, now - released_at):
+                self._discard(conn)
+                continue
+            return conn
+
+    def putconn(self, conn):
+        if conn.closed:
+            self._discard(conn)
+            return
+        try:
+            # Never hand out a connection with an open transaction
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._released_at[id(conn)] = time.monotonic()
+        self._pool.putconn(conn)
+
+    def _is_healthy(self, conn, idle_seconds):
+        if conn.closed:
+            return False
+        if idle_seconds < self._ping_idle_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+            self._released_at.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+
+# cursor_factory (optional) becomes the default cursor class of every pooled connection
+def create_pool(cursor_factory=None):
+    connect_kwargs = connection_settings()
+    if cursor_factory is not None:
+        connect_kwargs['cursor_factory'] = cursor_factory
+    return ConnectionPool(
+        POOL_MIN_CONNECTIONS,
+        POOL_MAX_CONNECTIONS,
+        POOL_CHECKOUT_TIMEOUT,
+        POOL_RECYCLE_SECONDS,
+        POOL_PING_IDLE_SECONDS,
+        **connect_kwargs
+    )
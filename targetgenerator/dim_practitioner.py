@@ -0,0 +1,41 @@
+"""
+Type 2 slowly changing maintenance of model.Dim_Practitioner from the planning1.practitioner roster.
+Requires Database/Dim_practitioner_scd2.sql, which also runs the sync after every roster change;
+this wrapper is for backfills and for running it by hand.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+from target_operations import transaction
+
+
+# Outcome of one dimension sync
+@dataclass
+class DimSyncResult:
+    practitioners_added: int = 0
+    practitioners_changed: int = 0
+    practitioners_removed: int = 0
+    as_of: date = None
+    dry_run: bool = False
+
+
+def sync_dim_practitioner(conn, as_of=None, dry_run=False):
+    """
+    Compare the hashed tracked attributes of every roster row with its current dimension row,
+    close the versions that changed or left the roster, and insert new current versions
+    effective from `as_of` (today by default), all in one transaction. A practitioner's first
+    version is effective from 1900-01-01 so that it covers their whole target history. Versions
+    are half-open: a closed version's effective_end_date is its successor's start date.
+    """
+    as_of = as_of or date.today()
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM model.sync_dim_practitioner(%s);", (as_of,))
+            added, changed, removed = cursor.fetchone()
+    return DimSyncResult(
+        practitioners_added=added,
+        practitioners_changed=changed,
+        practitioners_removed=removed,
+        as_of=as_of,
+        dry_run=dry_run,
+    )
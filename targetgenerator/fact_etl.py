@@ -0,0 +1,175 @@
+"""
+Incremental load of target hours from planning1.target_update into model.Fact_Performance.
+
+Only rows whose updated_at is newer than the stored high-water mark are read. A short
+lookback window is re-read on every run so rows committed slightly out of order are not
+missed; the upsert is idempotent, so re-reading them is harmless.
+Deleted targets are found through the tombstones that a trigger on planning1.target_update
+records in planning1.target_update_deleted; each run claims them and clears the matching fact
+target hours (a full reload clears every fact target without a source row). Facts are keyed by
+the practitioner version effective on their date, so a target edited after an SCD2 version
+change replaces the value under the old version instead of adding a second row.
+Requires Database/Fact_target_etl.sql.
+"""
+from dataclasses import dataclass
+
+from db import UPDATED_AT_LOOKBACK
+from target_operations import transaction
+
+ETL_JOB_NAME = 'fact_performance_target_hour'
+
+
+# Outcome of one incremental load
+@dataclass
+class EtlResult:
+    rows_changed: int = 0
+    rows_loaded: int = 0
+    rows_unresolved: int = 0
+    rows_cleared: int = 0
+    previous_high_water_mark: object = None
+    high_water_mark: object = None
+    dry_run: bool = False
+
+
+# A Dim_Practitioner version {d} is effective on {day}: half-open [effective_start_date, effective_end_date)
+EFFECTIVE_VERSION = (
+    "({d}.effective_start_date IS NULL OR {d}.effective_start_date <= {day}) "
+    "AND ({d}.effective_end_date IS NULL OR {day} < {d}.effective_end_date)"
+)
+
+WATERMARK_CTE = """watermark AS (
+    SELECT COALESCE(
+        (SELECT high_water_mark FROM model.etl_watermark WHERE job_name = %(job_name)s),
+        '-infinity'::timestamp
+    ) AS since
+)"""
+
+# Fact target hours that no longer belong where they are: their source target was deleted, or they
+# sit under a practitioner version that was not effective on their date while another one was (left
+# behind by an SCD2 version change). Candidates are the claimed tombstones and the targets changed
+# since the last run, or every fact target on a full reload. Rows left without any measure are
+# deleted, others keep their actuals.
+CLEAR_STALE_FACT_TARGETS_QUERY = f"""
+WITH {WATERMARK_CTE},
+claimed AS (
+    DELETE FROM planning1.target_update_deleted
+    RETURNING practitioner_id, target_date::date AS date
+),
+touched AS (
+    SELECT practitioner_id, date FROM claimed
+    UNION
+    SELECT t.practitioner_id, t.target_date::date
+    FROM planning1.target_update AS t
+    CROSS JOIN watermark AS w
+    WHERE t.updated_at > w.since - %(lookback)s::interval
+),
+removed AS (
+    SELECT f.date, f.practitioner_dim_id
+    FROM model.Fact_Performance AS f
+    JOIN model.Dim_Practitioner AS d ON d.practitioner_dim_id = f.practitioner_dim_id
+    WHERE f.target_hour IS NOT NULL
+      AND (%(full_reload)s OR EXISTS (
+          SELECT 1 FROM touched AS c WHERE c.practitioner_id = d.practitioner_id AND c.date = f.date
+      ))
+      AND (
+          NOT EXISTS (
+              SELECT 1 FROM planning1.target_update AS t
+              WHERE t.practitioner_id = d.practitioner_id AND t.target_date >= f.date AND t.target_date < f.date + 1
+          )
+          OR (
+              NOT ({EFFECTIVE_VERSION.format(d='d', day='f.date')})
+              AND EXISTS (
+                  SELECT 1 FROM model.Dim_Practitioner AS e
+                  WHERE e.practitioner_id = d.practitioner_id AND e.location_id IS NOT NULL
+                    AND {EFFECTIVE_VERSION.format(d='e', day='f.date')}
+              )
+          )
+      )
+),
+emptied AS (
+    DELETE FROM model.Fact_Performance AS f
+    USING removed AS r
+    WHERE f.date = r.date AND f.practitioner_dim_id = r.practitioner_dim_id
+      AND f.actual_hour IS NULL AND f.total_billing IS NULL
+    RETURNING 1
+),
+cleared AS (
+    UPDATE model.Fact_Performance AS f
+    SET target_hour = NULL
+    FROM removed AS r
+    WHERE f.date = r.date AND f.practitioner_dim_id = r.practitioner_dim_id
+      AND (f.actual_hour IS NOT NULL OR f.total_billing IS NOT NULL)
+    RETURNING 1
+)
+SELECT (SELECT count(*) FROM emptied) + (SELECT count(*) FROM cleared);
+"""
+
+SYNC_FACT_TARGETS_QUERY = f"""
+WITH {WATERMARK_CTE},
+changed AS (
+    SELECT t.practitioner_id, t.target_date::date AS date, t.target_hour, t.updated_at
+    FROM planning1.target_update AS t
+    CROSS JOIN watermark AS w
+    WHERE %(full_reload)s OR t.updated_at > w.since - %(lookback)s::interval
+),
+resolved AS (
+    SELECT DISTINCT ON (c.practitioner_id, c.date) c.date, d.practitioner_dim_id, d.location_id, c.target_hour
+    FROM changed AS c
+    JOIN model.Dim_Practitioner AS d
+        ON d.practitioner_id = c.practitioner_id AND {EFFECTIVE_VERSION.format(d='d', day='c.date')}
+    WHERE d.location_id IS NOT NULL
+    ORDER BY c.practitioner_id, c.date, d.effective_start_date DESC NULLS LAST
+),
+upserted AS (
+    INSERT INTO model.Fact_Performance (date, practitioner_dim_id, location_id, target_hour)
+    SELECT date, practitioner_dim_id, location_id, target_hour::DECIMAL(5, 1)
+    FROM resolved
+    ON CONFLICT (date, practitioner_dim_id) DO UPDATE
+    SET target_hour = EXCLUDED.target_hour
+    WHERE model.Fact_Performance.target_hour IS DISTINCT FROM EXCLUDED.target_hour
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM changed),
+    (SELECT count(*) FROM upserted),
+    (SELECT count(*) FROM changed) - (SELECT count(*) FROM resolved),
+    (SELECT since FROM watermark),
+    (SELECT max(updated_at) FROM changed);
+"""
+
+
+def sync_fact_targets(conn, full_reload=False, dry_run=False):
+    """
+    Upsert target hours changed since the last run into model.Fact_Performance, resolving
+    practitioner_dim_id and location_id through the Dim_Practitioner version effective on each
+    target date, clear stale fact target hours (deleted targets, superseded versions), and advance
+    the high-water mark. `full_reload` re-reads every target row and checks every fact target.
+    """
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            params = {'job_name': ETL_JOB_NAME, 'lookback': UPDATED_AT_LOOKBACK, 'full_reload': full_reload}
+            cursor.execute(CLEAR_STALE_FACT_TARGETS_QUERY, params)
+            rows_cleared = cursor.fetchone()[0]
+
+            cursor.execute(SYNC_FACT_TARGETS_QUERY, params)
+            rows_changed, rows_loaded, rows_unresolved, since, newest = cursor.fetchone()
+
+            high_water_mark = max(since, newest) if newest is not None else since
+            if newest is not None:
+                cursor.execute("""
+                INSERT INTO model.etl_watermark (job_name, high_water_mark, updated_at)
+                VALUES (%s, %s, now())
+                ON CONFLICT (job_name) DO UPDATE
+                SET high_water_mark = GREATEST(model.etl_watermark.high_water_mark, EXCLUDED.high_water_mark),
+                    updated_at = now();
+                """, (ETL_JOB_NAME, high_water_mark))
+
+    return EtlResult(
+        rows_changed=rows_changed,
+        rows_loaded=rows_loaded,
+        rows_unresolved=rows_unresolved,
+        rows_cleared=rows_cleared,
+        previous_high_water_mark=since,
+        high_water_mark=high_water_mark,
+        dry_run=dry_run,
+    )
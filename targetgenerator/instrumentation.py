@@ -0,0 +1,255 @@
+"""
+Optional query and rerun instrumentation for the Streamlit app, enabled with INSTRUMENTATION=1.
+
+When enabled, pooled connections use InstrumentedCursor. It records every statement
+(fingerprint, round trips, rows, DB time) into the trace of the current thread. Streamlit runs
+each rerun on its own script thread, so traces from different sessions never mix. Each finished
+rerun is written as one JSON line to the instrumentation log.
+
+Pool checkouts are timed separately (checkout()), so waiting for a free connection shows up as
+checkout time rather than being lost or mistaken for query time.
+
+Fragments that rerun on their own are traced through fragment(): inside a full rerun they are a span
+of it, otherwise they get a trace of their own, logged like a rerun with event "fragment".
+
+When disabled, connections keep the default cursor and rerun()/span()/checkout()/fragment() do nothing.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from psycopg2 import extensions
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION", "0") == "1"
+
+# Users who see the instrumentation panel (comma separated)
+INSTRUMENTATION_ADMINS = {name.strip() for name in os.getenv("INSTRUMENTATION_ADMINS", "admin").split(",") if name.strip()}
+
+# JSON lines file for the rerun records; stderr when empty
+INSTRUMENTATION_LOG = os.getenv("INSTRUMENTATION_LOG", "")
+
+logger = logging.getLogger("targetgenerator.instrumentation")
+
+_local = threading.local()
+
+# Literals and value lists are replaced so one statement with different parameters shares a fingerprint
+NORMALIZE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"ARRAY\[[^\]]*\]"), "ARRAY[...]"),
+    (re.compile(r"\((?:[^()]|\([^()]*\))*\)(?:\s*,\s*\((?:[^()]|\([^()]*\))*\))+"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+# Normalized statement text and its short fingerprint
+def fingerprint(statement):
+    if isinstance(statement, bytes):
+        statement = statement.decode(errors='replace')
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    statement = statement.strip()
+    return hashlib.md5(statement.encode()).hexdigest()[:12], statement
+
+
+# Totals for one statement fingerprint within a rerun
+@dataclass
+class QueryStat:
+    fingerprint: str
+    statement: str
+    calls: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+
+
+# Wall-clock and DB time of one named section of a rerun
+@dataclass
+class Span:
+    name: str
+    seconds: float = 0.0
+    db_seconds: float = 0.0
+    round_trips: int = 0
+
+
+# Everything recorded during one Streamlit rerun
+@dataclass
+class RerunTrace:
+    user: str
+    event: str = 'rerun'
+    started_at: datetime = field(default_factory=datetime.now)
+    started: float = field(default_factory=time.perf_counter)
+    queries: dict = field(default_factory=dict)
+    spans: list = field(default_factory=list)
+    checkouts: int = 0
+    checkout_seconds: float = 0.0
+    seconds: float = None
+
+    @property
+    def elapsed(self):
+        return self.seconds if self.seconds is not None else time.perf_counter() - self.started
+
+    @property
+    def round_trips(self):
+        return sum(stat.calls for stat in self.queries.values())
+
+    @property
+    def rows(self):
+        return sum(stat.rows for stat in self.queries.values())
+
+    @property
+    def db_seconds(self):
+        return sum(stat.seconds for stat in self.queries.values())
+
+    def record_query(self, statement, seconds, rows, calls=1):
+        key, normalized = fingerprint(statement)
+        stat = self.queries.get(key)
+        if stat is None:
+            stat = self.queries[key] = QueryStat(key, normalized)
+        stat.calls += calls
+        stat.rows += max(rows, 0)
+        stat.seconds += seconds
+
+    def to_record(self):
+        return {
+            'event': self.event,
+            'user': self.user,
+            'started_at': self.started_at.isoformat(timespec='milliseconds'),
+            'total_ms': round(self.elapsed * 1000, 3),
+            'db_ms': round(self.db_seconds * 1000, 3),
+            'round_trips': self.round_trips,
+            'rows': self.rows,
+            'checkouts': self.checkouts,
+            'checkout_ms': round(self.checkout_seconds * 1000, 3),
+            'spans': [
+                {'name': span.name, 'ms': round(span.seconds * 1000, 3), 'db_ms': round(span.db_seconds * 1000, 3),
+                 'round_trips': span.round_trips}
+                for span in self.spans
+            ],
+            'queries': [
+                {'fingerprint': stat.fingerprint, 'statement': stat.statement, 'calls': stat.calls,
+                 'rows': stat.rows, 'ms': round(stat.seconds * 1000, 3)}
+                for stat in sorted(self.queries.values(), key=lambda stat: stat.seconds, reverse=True)
+            ],
+        }
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+# Cursor that records each statement into the current thread's trace (if any)
+class InstrumentedCursor(extensions.cursor):
+    def _timed(self, statement, call, calls=1):
+        trace = current_trace()
+        if trace is None:
+            return call()
+        started = time.perf_counter()
+        try:
+            return call()
+        finally:
+            trace.record_query(statement, time.perf_counter() - started, self.rowcount, calls)
+
+    def execute(self, query, vars=None):
+        return self._timed(query, lambda: super(InstrumentedCursor, self).execute(query, vars))
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        return self._timed(
+            query, lambda: super(InstrumentedCursor, self).executemany(query, vars_list), len(vars_list)
+        )
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(sql, lambda: super(InstrumentedCursor, self).copy_expert(sql, file, size))
+
+
+# Cursor class for new connections: instrumented when enabled, psycopg2's default otherwise
+def cursor_factory():
+    return InstrumentedCursor if INSTRUMENTATION_ENABLED else None
+
+
+def configure_logging():
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(INSTRUMENTATION_LOG) if INSTRUMENTATION_LOG else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+@contextmanager
+def rerun(user, event='rerun'):
+    """Trace one rerun of the app and log it when it ends; yields the trace, or None when disabled."""
+    if not INSTRUMENTATION_ENABLED:
+        yield None
+        return
+
+    configure_logging()
+    trace = RerunTrace(user=user, event=event)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        trace.seconds = time.perf_counter() - trace.started
+        _local.trace = None
+        logger.info(json.dumps(trace.to_record()))
+
+
+@contextmanager
+def span(name):
+    """Time a named section of the current rerun, including the DB time spent inside it."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+
+    db_seconds, round_trips = trace.db_seconds, trace.round_trips
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append(Span(
+            name=name,
+            seconds=time.perf_counter() - started,
+            db_seconds=trace.db_seconds - db_seconds,
+            round_trips=trace.round_trips - round_trips,
+        ))
+
+
+@contextmanager
+def checkout():
+    """Time a connection pool checkout (including any wait for a free connection) in the current rerun."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.checkouts += 1
+        trace.checkout_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def fragment(name, user):
+    """
+    Trace the body of a fragment. Within a full rerun it is a span of that rerun; when the fragment
+    reruns on its own it gets its own trace. Yields the new trace, or None when there is none.
+    """
+    if current_trace() is not None:
+        with span(f"fragment:{name}"):
+            yield None
+        return
+
+    with rerun(user, event='fragment') as trace:
+        with span(f"fragment:{name}"):
+            yield trace
@@ -0,0 +1,120 @@
+"""
+Parallel year-rollover: clone the latest week of targets onto a new period, one shard per
+clinic location (or manager). Each shard runs on its own connection and transaction, so a
+failing shard is retried on its own and never rolls back the others.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import psycopg2
+from psycopg2 import errors
+
+import db
+import target_operations as ops
+
+SHARD_COLUMNS = {
+    'location': 'clinic_location',
+    'manager': 'manager_name',
+}
+
+# Errors worth retrying: lost connections, deadlocks and serialization failures
+RETRYABLE_ERRORS = (psycopg2.OperationalError, errors.TransactionRollbackError)
+
+
+# Outcome of one shard
+@dataclass
+class ShardResult:
+    shard: str
+    practitioner_count: int
+    attempts: int = 0
+    seconds: float = 0.0
+    result: ops.InsertResult = None
+    error: str = None
+
+
+# Combined outcome of all shards
+@dataclass
+class RolloverReport:
+    shards: list = field(default_factory=list)
+    source_week_start: object = None
+
+    @property
+    def failed_shards(self):
+        return [shard for shard in self.shards if shard.error]
+
+    @property
+    def records_inserted(self):
+        return sum(shard.result.records_inserted for shard in self.shards if shard.result)
+
+    @property
+    def conflicts(self):
+        return sum(shard.result.records_planned - shard.result.records_inserted for shard in self.shards if shard.result)
+
+    @property
+    def holidays_skipped(self):
+        return sorted({date for shard in self.shards if shard.result for date in shard.result.holidays_skipped})
+
+
+def split_roster(roster_df, shard_by='location'):
+    """Group practitioner ids by the shard column; returns {shard name: [practitioner ids]}."""
+    column = SHARD_COLUMNS[shard_by]
+    grouped = roster_df.groupby(roster_df[column].fillna("(none)"))['practitioner_id']
+    return {str(shard): ids.tolist() for shard, ids in grouped}
+
+
+def run_shard(shard, practitioner_ids, start_date, end_date, source_week_start, dry_run, retries, connect):
+    shard_result = ShardResult(shard=shard, practitioner_count=len(practitioner_ids))
+    started = time.perf_counter()
+    while True:
+        shard_result.attempts += 1
+        try:
+            conn = connect()
+            try:
+                shard_result.result = ops.clone_targets(
+                    conn, practitioner_ids, start_date, end_date, dry_run=dry_run, source_week_start=source_week_start
+                )
+            finally:
+                conn.close()
+            shard_result.error = None
+            break
+        except RETRYABLE_ERRORS as e:
+            shard_result.error = str(e).strip()
+            if shard_result.attempts > retries:
+                break
+            time.sleep(min(2 ** shard_result.attempts, 30))  # back off before retrying
+        except Exception as e:
+            shard_result.error = str(e).strip()
+            break
+    shard_result.seconds = time.perf_counter() - started
+    return shard_result
+
+
+def run_rollover(roster_df, start_date, end_date, shard_by='location', workers=4, retries=2,
+                 dry_run=False, connect=db.connect):
+    """
+    Clone the latest week onto start_date..end_date for every practitioner in `roster_df`,
+    running one shard per location/manager concurrently on `workers` threads.
+    """
+    report = RolloverReport()
+
+    # Pin the source week once so shards finishing early cannot move "latest week" for the others
+    conn = connect()
+    try:
+        report.source_week_start = ops.load_latest_week_start(conn)
+    finally:
+        conn.close()
+    if report.source_week_start is None:
+        return report
+
+    shards = split_roster(roster_df, shard_by)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_shard, shard, ids, start_date, end_date, report.source_week_start, dry_run, retries, connect)
+            for shard, ids in shards.items()
+        ]
+        for future in as_completed(futures):
+            report.shards.append(future.result())
+
+    report.shards.sort(key=lambda shard: shard.shard)
+    return report
@@ -0,0 +1,22 @@
+"""
+Incremental refresh of the week/month/quarter/year rollups in model.Rollup_Performance.
+Requires Database/Rollups.sql; only periods containing facts changed since the last refresh are rebuilt.
+"""
+from dataclasses import dataclass
+
+from target_operations import transaction
+
+
+# Outcome of one rollup refresh
+@dataclass
+class RollupResult:
+    rows_written: int = 0
+    dry_run: bool = False
+
+
+def refresh_rollups(conn, full_rebuild=False, dry_run=False):
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT model.refresh_performance_rollups(%s);", (full_rebuild,))
+            rows_written = cursor.fetchone()[0]
+    return RollupResult(rows_written=rows_written, dry_run=dry_run)
@@ -0,0 +1,159 @@
+"""
+Deterministic synthetic organization for benchmarks: locations, managers, practitioners,
+a statutory holiday calendar and years of weekday target history.
+
+The same OrgSpec (including its seed) always produces the same rows, so benchmark results
+from different runs and commits are comparable. load_org replaces the contents of the
+planning1 tables, so only point it at a scratch database.
+"""
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from target_operations import transaction
+from target_schedule import expand_schedule
+
+# Fixed-date statutory holidays (MM-DD: name) used when no calendar is given
+DEFAULT_HOLIDAYS = {
+    "01-01": "New Year's Day",
+    "07-01": "Canada Day",
+    "11-11": "Remembrance Day",
+    "12-25": "Christmas Day",
+    "12-26": "Boxing Day",
+}
+
+EMPLOYEE_TYPES = ["Full-time", "Part-time", "Contract"]
+
+# Weekday hours a practitioner can be scheduled for (Monday-Friday); weekends are rarer
+WEEKDAY_HOUR_CHOICES = np.array([6.0, 7.0, 7.5, 8.0])
+WEEKEND_HOUR_CHOICES = np.array([4.0, 6.0])
+WEEKEND_SHARE = 0.1
+PART_TIME_DAY_OFF_SHARE = 0.4
+
+# Timestamp stored in updated_at for all generated history
+HISTORY_UPDATED_AT = datetime(2000, 1, 1)
+
+
+@dataclass
+class OrgSpec:
+    locations: int = 5
+    managers: int = 20
+    practitioners: int = 200
+    first_year: int = 2023
+    history_years: int = 3
+    holidays: dict = field(default_factory=lambda: dict(DEFAULT_HOLIDAYS))
+    seed: int = 42
+
+    @property
+    def label(self):
+        return f"{self.locations}x{self.managers}x{self.practitioners}"
+
+    @property
+    def next_year(self):
+        """First year without history, used for set and clone benchmarks."""
+        return self.first_year + self.history_years
+
+
+def holiday_frame(spec):
+    rows = [
+        (date(year, int(month_day[:2]), int(month_day[3:])), name)
+        for year in range(spec.first_year, spec.next_year + 1)
+        for month_day, name in sorted(spec.holidays.items())
+    ]
+    return pd.DataFrame(rows, columns=['holiday_date', 'holiday_name'])
+
+
+def practitioner_frame(spec, rng):
+    location_names = np.array([f"Location {index:03d}" for index in range(1, spec.locations + 1)], dtype=object)
+    manager_names = np.array([f"Manager {index:03d}" for index in range(1, spec.managers + 1)], dtype=object)
+
+    # Each manager works at one location; practitioners report to a random manager and share its location
+    manager_location = np.arange(spec.managers) % spec.locations
+    manager_index = rng.integers(0, spec.managers, spec.practitioners)
+
+    return pd.DataFrame({
+        'practitioner_id': np.arange(1, spec.practitioners + 1),
+        'practitioner_name': [f"Practitioner {index:06d}" for index in range(1, spec.practitioners + 1)],
+        'employee_type': rng.choice(EMPLOYEE_TYPES, spec.practitioners, p=[0.6, 0.3, 0.1]),
+        'clinic_location': location_names[manager_location[manager_index]],
+        'bill_rate_standard': rng.integers(80, 200, spec.practitioners),
+        'bill_rate_special': rng.integers(100, 260, spec.practitioners),
+        'manager_name': manager_names[manager_index],
+    })
+
+
+def weekday_hours(practitioners_df, rng):
+    """Practitioners x 7 weekday hours matrix (Monday first, NaN = not scheduled)."""
+    count = len(practitioners_df)
+    hours = np.full((count, 7), np.nan)
+    hours[:, :5] = rng.choice(WEEKDAY_HOUR_CHOICES, (count, 1))
+
+    part_time = (practitioners_df['employee_type'] != "Full-time").to_numpy()
+    day_off = rng.random((count, 5)) < PART_TIME_DAY_OFF_SHARE
+    hours[:, :5][part_time[:, None] & day_off] = np.nan
+
+    weekend = rng.random((count, 2)) < WEEKEND_SHARE
+    hours[:, 5:] = np.where(weekend, rng.choice(WEEKEND_HOUR_CHOICES, (count, 2)), np.nan)
+    return hours
+
+
+def generate_org(spec):
+    """
+    Build the synthetic organization. Returns (practitioners_df, holidays_df, history), where
+    `history` yields one target_update frame per history year to keep memory bounded.
+    """
+    rng = np.random.default_rng(spec.seed)
+    practitioners_df = practitioner_frame(spec, rng)
+    holidays_df = holiday_frame(spec)
+    hours = weekday_hours(practitioners_df, rng)
+    names = practitioners_df['practitioner_name'].to_numpy()
+
+    def history():
+        for year in range(spec.first_year, spec.next_year):
+            grid = expand_schedule(
+                date(year, 1, 1), date(year, 12, 31), hours, holidays_df['holiday_date'],
+                practitioners_df['practitioner_id'],
+            )
+            yield pd.DataFrame({
+                'practitioner_id': grid.practitioner_ids,
+                'practitioner_name': names[grid.practitioner_index],
+                'target_date': grid.target_dates.astype('datetime64[ns]'),
+                'target_hour': grid.target_hours,
+                'updated_at': HISTORY_UPDATED_AT,
+            })
+
+    return practitioners_df, holidays_df, history()
+
+
+# Send a frame to the server with COPY ... FROM STDIN
+def copy_frame(cursor, table, frame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ", ".join(frame.columns)
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load_org(conn, spec):
+    """
+    Replace planning1.practitioner, planning1.statutory_holidays and planning1.target_update
+    with the synthetic organization in one transaction. Returns the number of target rows loaded.
+    """
+    practitioners_df, holidays_df, history = generate_org(spec)
+    target_rows = 0
+    with transaction(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "TRUNCATE planning1.target_update, planning1.statutory_holidays, planning1.practitioner;"
+            )
+            copy_frame(cursor, "planning1.practitioner", practitioners_df)
+            copy_frame(cursor, "planning1.statutory_holidays", holidays_df)
+            for year_df in history:
+                copy_frame(cursor, "planning1.target_update", year_df)
+                target_rows += len(year_df)
+            # Fresh statistics so the planner sees the new table sizes
+            cursor.execute("ANALYZE planning1.practitioner, planning1.statutory_holidays, planning1.target_update;")
+    return target_rows
@@ -0,0 +1,103 @@
+import math
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+CHART_MODES = ["Practitioner", "Location mean", "Manager mean", "P10-P90 band"]
+
+# Time resolution options mapped to pandas resample rules
+RESAMPLE_RULES = {
+    "Daily": None,
+    "Weekly": "W",
+    "Monthly": "MS",
+}
+
+# Maximum number of plotted points (dates x lines) before the series are bucketed further
+DEFAULT_POINT_BUDGET = 5000
+
+# Lines beyond this count are drawn without a legend and without markers
+MAX_LEGEND_ENTRIES = 20
+
+
+# Pivot the long target frame once into a dates x practitioner_id matrix
+def pivot_targets(consolidated_df):
+    df = consolidated_df[['practitioner_id', 'target_date', 'target_hour']].copy()
+    df['target_date'] = pd.to_datetime(df['target_date'])
+    return df.pivot(index='target_date', columns='practitioner_id', values='target_hour').sort_index()
+
+
+# Average every line into at most `point_budget` points by bucketing consecutive dates
+def downsample(frame, point_budget):
+    points = len(frame) * max(frame.shape[1], 1)
+    if points <= point_budget or len(frame) == 0:
+        return frame, 1
+
+    step = math.ceil(points / point_budget)
+    buckets = np.arange(len(frame)) // step
+    bucketed = frame.groupby(buckets).mean()
+    bucketed.index = frame.index[::step]
+    return bucketed, step
+
+
+def build_chart_frames(consolidated_df, practitioners_df, mode, resample_rule=None, point_budget=DEFAULT_POINT_BUDGET):
+    """
+    Turn the consolidated target frame into the series to plot.
+
+    Returns (lines, band, step): `lines` has one column per plotted line indexed by date, `band` is
+    a (p10, p90) pair of Series for the band mode (otherwise None), and `step` is the number of
+    dates averaged into each plotted point by the automatic downsampling.
+    """
+    wide = pivot_targets(consolidated_df)
+    if resample_rule:
+        wide = wide.resample(resample_rule).mean()
+
+    roster = practitioners_df.drop_duplicates('practitioner_id').set_index('practitioner_id')
+    band = None
+
+    if mode == "Location mean":
+        lines = wide.T.groupby(roster['clinic_location'].reindex(wide.columns).values).mean().T
+    elif mode == "Manager mean":
+        lines = wide.T.groupby(roster['manager_name'].reindex(wide.columns).values).mean().T
+    elif mode == "P10-P90 band":
+        quantiles = wide.quantile([0.1, 0.5, 0.9], axis=1).T
+        quantiles.columns = ['p10', 'median', 'p90']
+        quantiles, step = downsample(quantiles, point_budget)
+        return quantiles[['median']], (quantiles['p10'], quantiles['p90']), step
+    else:
+        lines = wide.rename(columns=roster['practitioner_name'].to_dict())
+
+    lines, step = downsample(lines, point_budget)
+    return lines, band, step
+
+
+def plot_target_chart(lines, band=None, mode="Practitioner"):
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    if band is not None:
+        ax.fill_between(lines.index, band[0], band[1], alpha=0.3, label="P10-P90")
+
+    # Markers only help when there are few points to look at
+    many_lines = lines.shape[1] > MAX_LEGEND_ENTRIES
+    marker = 'o' if not many_lines and len(lines) <= 100 else None
+    for label, series in lines.items():
+        ax.plot(series.index, series.values, marker=marker, linestyle='-', linewidth=1 if many_lines else 1.5, label=label)
+
+    # Set title and labels
+    ax.set_title(f"Target Hours Over Time ({mode})")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Target Hour")
+
+    # Format x-axis dates
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    fig.autofmt_xdate(rotation=45)
+
+    # Display grid for better readability
+    ax.grid(True, linestyle='--', alpha=0.6)
+
+    # Add a legend to distinguish the lines when it is still readable
+    if not many_lines:
+        ax.legend(title=mode)
+
+    return fig
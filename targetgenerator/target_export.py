@@ -0,0 +1,100 @@
+import pandas as pd
+
+EXPORT_COLUMNS = [
+    'practitioner_id',
+    'practitioner_name',
+    'clinic_location',
+    'manager_name',
+    'target_date',
+    'target_hour',
+    'updated_at',
+]
+
+# Number of rows fetched per round trip when streaming to Parquet
+EXPORT_CHUNK_ROWS = 50000
+
+
+# Build the filtered export query; None (or an empty list) means no filter on that field
+def build_export_query(cursor, locations=None, managers=None, start_date=None, end_date=None):
+    conditions = []
+    params = []
+    if locations:
+        conditions.append("p.clinic_location = ANY(%s)")
+        params.append(list(locations))
+    if managers:
+        conditions.append("p.manager_name = ANY(%s)")
+        params.append(list(managers))
+    if start_date is not None:
+        conditions.append("t.target_date >= %s")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("t.target_date <= %s")
+        params.append(end_date)
+
+    query = """
+    SELECT t.practitioner_id, p.practitioner_name, p.clinic_location, p.manager_name,
+           t.target_date, t.target_hour, t.updated_at
+    FROM planning1.target_update AS t
+    JOIN planning1.practitioner AS p ON t.practitioner_id = p.practitioner_id
+    """
+    if conditions:
+        query += "WHERE " + " AND ".join(conditions) + "\n"
+    query += "ORDER BY t.target_date, t.practitioner_id"
+
+    # COPY does not accept bind parameters, so the query is rendered client-side
+    return cursor.mogrify(query, params).decode()
+
+
+def count_export_rows(conn, **filters):
+    """Number of rows an export with these filters would write, counted on the server."""
+    with conn.cursor() as cursor:
+        query = build_export_query(cursor, **filters)
+        cursor.execute(f"SELECT count(*) FROM ({query}) AS export_rows;")
+        return cursor.fetchone()[0]
+
+
+def export_targets_csv(conn, out_file, **filters):
+    """
+    Stream the filtered targets as CSV into a binary file object with COPY ... TO STDOUT.
+    Rows go straight from the server to the file; returns the number of rows written.
+    """
+    with conn.cursor() as cursor:
+        query = build_export_query(cursor, **filters)
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", out_file)
+        return cursor.rowcount
+
+
+def export_targets_parquet(conn, out_file, chunk_rows=EXPORT_CHUNK_ROWS, **filters):
+    """
+    Stream the filtered targets into a Parquet file through a named server-side cursor,
+    writing one row group per chunk so memory stays bounded by `chunk_rows`.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('practitioner_id', pa.int32()),
+        ('practitioner_name', pa.string()),
+        ('clinic_location', pa.string()),
+        ('manager_name', pa.string()),
+        ('target_date', pa.timestamp('us')),
+        ('target_hour', pa.float64()),
+        ('updated_at', pa.timestamp('us')),
+    ])
+
+    with conn.cursor() as cursor:
+        query = build_export_query(cursor, **filters)
+
+    rows_written = 0
+    with conn.cursor(name='target_export') as cursor, pq.ParquetWriter(out_file, schema) as writer:
+        cursor.itersize = chunk_rows
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            chunk = pd.DataFrame.from_records(rows, columns=EXPORT_COLUMNS)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows_written += len(rows)
+    return rows_written
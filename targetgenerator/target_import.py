@@ -0,0 +1,113 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ['practitioner_id', 'target_date', 'target_hour']
+
+# Accepted range for an imported daily target
+MIN_TARGET_HOUR = 0.0
+MAX_TARGET_HOUR = 24.0
+
+
+# Read an uploaded CSV or Excel file into a frame with normalized column names
+def read_target_file(file, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in (".xlsx", ".xls"):
+        df = pd.read_excel(file)
+    else:
+        df = pd.read_csv(file)
+    df.columns = [str(column).strip().lower().replace(" ", "_") for column in df.columns]
+    return df
+
+
+def validate_targets(df, practitioner_ids, holidays, min_hour=MIN_TARGET_HOUR, max_hour=MAX_TARGET_HOUR):
+    """
+    Validate imported targets column-wise.
+
+    Returns (valid_df, rejected_df). `valid_df` has typed practitioner_id, target_date and
+    target_hour columns; `rejected_df` keeps the original values plus an `error` column with
+    the first problem found on each row.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    practitioner_id = pd.to_numeric(df['practitioner_id'], errors='coerce')
+    target_date = pd.to_datetime(df['target_date'], errors='coerce').dt.normalize()
+    target_hour = pd.to_numeric(df['target_hour'], errors='coerce')
+
+    holiday_dates = pd.to_datetime(pd.Series(sorted(holidays), dtype='object'))
+    known_ids = pd.Series(list(practitioner_ids)).astype('int64')
+    duplicated = pd.DataFrame({'id': practitioner_id, 'date': target_date}).duplicated(keep='last')
+
+    # Checks in priority order; the first failing one is reported
+    checks = [
+        (practitioner_id.isna() | (practitioner_id % 1 != 0), "Invalid practitioner_id"),
+        (~practitioner_id.isin(known_ids), "Unknown practitioner_id"),
+        (target_date.isna(), "Invalid target_date"),
+        (target_hour.isna(), "Invalid target_hour"),
+        ((target_hour < min_hour) | (target_hour > max_hour), f"target_hour outside {min_hour:g}-{max_hour:g}"),
+        (target_date.isin(holiday_dates), "Statutory holiday"),
+        (duplicated, "Duplicate row (a later row for the same practitioner and date wins)"),
+    ]
+    error = pd.Series(
+        np.select([condition.to_numpy() for condition, _ in checks], [message for _, message in checks], default=""),
+        index=df.index,
+    )
+
+    is_valid = error == ""
+    valid_df = pd.DataFrame({
+        'practitioner_id': practitioner_id[is_valid].astype('int64'),
+        'target_date': target_date[is_valid],
+        'target_hour': target_hour[is_valid].astype('float64'),
+    })
+    rejected_df = df[~is_valid].assign(error=error[~is_valid])
+    return valid_df, rejected_df
+
+
+def merge_targets(conn, valid_df, updated_at, overwrite=False):
+    """
+    COPY validated targets into a temporary staging table and merge them into
+    planning1.target_update. Existing targets are overwritten when `overwrite` is set
+    and left untouched otherwise.
+
+    Existing rows are updated first and new rows inserted second, so each count comes from its
+    own statement (system columns such as xmax cannot be read from the partitioned table).
+
+    Returns (inserted, updated) row counts. The caller commits.
+    """
+    buffer = io.StringIO()
+    valid_df[REQUIRED_COLUMNS].to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S')
+    buffer.seek(0)
+
+    updated = 0
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TEMP TABLE target_update_staging (
+            practitioner_id INTEGER,
+            target_date TIMESTAMP,
+            target_hour DOUBLE PRECISION
+        ) ON COMMIT DROP;
+        """)
+        cursor.copy_expert("COPY target_update_staging FROM STDIN WITH (FORMAT csv)", buffer)
+
+        if overwrite:
+            cursor.execute("""
+            UPDATE planning1.target_update AS t
+            SET target_hour = s.target_hour, updated_at = %s
+            FROM target_update_staging AS s
+            WHERE t.practitioner_id = s.practitioner_id AND t.target_date = s.target_date;
+            """, (updated_at,))
+            updated = cursor.rowcount
+
+        cursor.execute("""
+        INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
+        SELECT s.practitioner_id, p.practitioner_name, s.target_date, s.target_hour, %s
+        FROM target_update_staging AS s
+        JOIN planning1.practitioner AS p ON p.practitioner_id = s.practitioner_id
+        ON CONFLICT (practitioner_id, target_date) DO NOTHING;
+        """, (updated_at,))
+        inserted = cursor.rowcount
+    return inserted, updated
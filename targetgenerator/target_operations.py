@@ -0,0 +1,677 @@
+"""
+Data operations on the planning1 schema, independent of Streamlit.
+
+Every function takes an open psycopg2 connection and returns plain values or result objects;
+errors are raised to the caller. Write operations commit their own transaction, or roll it
+back when `dry_run` is set so the reported counts can be inspected without changing data.
+"""
+import math
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from db import UPDATED_AT_LOOKBACK
+from target_schedule import DAYS_OF_WEEK
+
+# Number of rows sent per UPDATE statement by update_target_hours
+UPDATE_PAGE_SIZE = int(os.getenv("UPDATE_PAGE_SIZE", "5000"))
+
+# Column types of the consolidated target frame
+TARGET_UPDATE_DTYPES = {
+    'practitioner_id': 'int64',
+    'practitioner_name': 'object',
+    'target_date': 'datetime64[ns]',
+    'target_hour': 'float64',
+}
+
+
+# Outcome of a set or clone operation
+@dataclass
+class InsertResult:
+    records_planned: int = 0
+    records_inserted: int = 0
+    holidays_skipped: list = field(default_factory=list)
+    dry_run: bool = False
+
+    @property
+    def conflicts_found(self):
+        return self.records_inserted < self.records_planned
+
+
+# Outcome of an update operation
+@dataclass
+class UpdateResult:
+    rows_updated: int = 0
+    dry_run: bool = False
+
+
+# Outcome of a delete operation
+@dataclass
+class DeleteResult:
+    rows_deleted: int = 0
+    dry_run: bool = False
+
+
+# Raised when a plan can no longer be applied exactly as it was computed
+class StalePlanError(Exception):
+    pass
+
+
+# Outcome of a set or clone operation, computed before anything is written. Only the per-practitioner
+# `summary` (to_insert, conflicts, holidays_skipped and hours_to_insert) is kept; the row-level detail
+# is evaluated again from the query `params` when it is downloaded or applied.
+@dataclass
+class TargetPlan:
+    operation: str
+    params: dict
+    summary: pd.DataFrame
+    holidays_skipped: list = field(default_factory=list)
+    source_week_start: object = None
+    planned_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def start_date(self):
+        return self.params['start_date']
+
+    @property
+    def end_date(self):
+        return self.params['end_date']
+
+    @property
+    def records_to_insert(self):
+        return int(self.summary['to_insert'].sum())
+
+    @property
+    def conflicts(self):
+        return int(self.summary['conflicts'].sum())
+
+    @property
+    def hours_to_insert(self):
+        return float(self.summary['hours_to_insert'].sum())
+
+
+# Commit on success (or roll back for a dry run); roll back and re-raise on failure
+@contextmanager
+def transaction(conn, dry_run=False):
+    try:
+        yield
+    except Exception:
+        conn.rollback()
+        raise
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+
+
+# Cheap fingerprint of planning1.practitioner (row count + newest row version)
+def load_roster_version(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT count(*), coalesce(max(xmin::text::bigint), 0) FROM planning1.practitioner;")
+        row_count, max_xmin = cursor.fetchone()
+    return f"{row_count}:{max_xmin}"
+
+
+# Load data from the practitioner table
+def load_roster(conn):
+    query = "SELECT practitioner_id, practitioner_name, clinic_location, manager_name FROM planning1.practitioner;"
+    return pd.read_sql(query, conn)
+
+
+# Narrow the roster down by location, manager and/or practitioner id; None (or empty) means no filter
+def filter_roster(roster_df, locations=None, managers=None, practitioner_ids=None):
+    mask = pd.Series(True, index=roster_df.index)
+    if locations:
+        mask &= roster_df['clinic_location'].isin(locations)
+    if managers:
+        mask &= roster_df['manager_name'].isin(managers)
+    if practitioner_ids:
+        mask &= roster_df['practitioner_id'].isin([int(practitioner_id) for practitioner_id in practitioner_ids])
+    return roster_df[mask]
+
+
+# Load all statutory holiday dates
+def load_holidays(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT holiday_date FROM planning1.statutory_holidays;")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def empty_target_updates():
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in TARGET_UPDATE_DTYPES.items()})
+
+
+# Load target updates with practitioner name for a group of practitioners and date range in a single query
+def load_target_updates_many(conn, practitioner_ids, start_date, end_date):
+    practitioner_ids = [int(practitioner_id) for practitioner_id in practitioner_ids]  # Ensure ids are Python ints
+    if not practitioner_ids:
+        return empty_target_updates()
+
+    query = """
+    SELECT p.practitioner_id, p.practitioner_name, t.target_date, t.target_hour
+    FROM planning1.target_update AS t
+    JOIN planning1.practitioner AS p ON t.practitioner_id = p.practitioner_id
+    WHERE t.practitioner_id = ANY(%s) AND t.target_date BETWEEN %s AND %s
+    ORDER BY p.practitioner_name, t.target_date;
+    """
+    df = pd.read_sql(query, conn, params=(practitioner_ids, start_date, end_date))
+    if df.empty:
+        return empty_target_updates()
+    return df.astype(TARGET_UPDATE_DTYPES)
+
+
+# Consolidated targets of a selection and date range, kept up to date by refresh_target_frame
+@dataclass
+class TargetFrame:
+    practitioner_ids: list
+    start_date: object
+    end_date: object
+    frame: pd.DataFrame  # TARGET_UPDATE_DTYPES columns plus updated_at
+    high_water_mark: object = None
+
+    @property
+    def targets(self):
+        return self.frame[list(TARGET_UPDATE_DTYPES)]
+
+
+TARGET_FRAME_QUERY = """
+SELECT p.practitioner_id, p.practitioner_name, t.target_date, t.target_hour, t.updated_at
+FROM planning1.target_update AS t
+JOIN planning1.practitioner AS p ON t.practitioner_id = p.practitioner_id
+WHERE t.practitioner_id = ANY(%(practitioner_ids)s) AND t.target_date BETWEEN %(start_date)s AND %(end_date)s
+  AND (%(since)s::timestamp IS NULL OR t.updated_at > %(since)s::timestamp)
+ORDER BY p.practitioner_name, t.target_date;
+"""
+
+# Rows of the recheck window (updated_at > since) whose updated_at batch is new or has a different row
+# count than the cached frame's (known_times/known_counts). Every write stamps its rows with one
+# updated_at, so a finished Set, Clone or Apply All is not downloaded again on later refreshes.
+TARGET_FRAME_DELTA_QUERY = """
+WITH recent AS (
+    SELECT p.practitioner_id, p.practitioner_name, t.target_date, t.target_hour, t.updated_at
+    FROM planning1.target_update AS t
+    JOIN planning1.practitioner AS p ON t.practitioner_id = p.practitioner_id
+    WHERE t.practitioner_id = ANY(%(practitioner_ids)s) AND t.target_date BETWEEN %(start_date)s AND %(end_date)s
+      AND t.updated_at > %(since)s::timestamp
+),
+known AS (
+    SELECT * FROM unnest(%(known_times)s::timestamp[], %(known_counts)s::bigint[]) AS k(updated_at, row_count)
+),
+changed AS (
+    SELECT r.updated_at
+    FROM recent AS r
+    GROUP BY r.updated_at
+    HAVING count(*) <> COALESCE((SELECT k.row_count FROM known AS k WHERE k.updated_at = r.updated_at), 0)
+)
+SELECT * FROM recent
+WHERE updated_at IN (SELECT updated_at FROM changed)
+ORDER BY practitioner_name, target_date;
+"""
+
+# Row count and target_date checksum per practitioner, to notice deleted rows without reading them
+TARGET_FRAME_STATS_QUERY = """
+SELECT practitioner_id, count(*) AS row_count, sum(extract(epoch FROM target_date))::bigint AS date_checksum
+FROM planning1.target_update
+WHERE practitioner_id = ANY(%(practitioner_ids)s) AND target_date BETWEEN %(start_date)s AND %(end_date)s
+GROUP BY practitioner_id;
+"""
+
+
+def _read_target_frame(conn, practitioner_ids, start_date, end_date, since=None):
+    params = {
+        'practitioner_ids': practitioner_ids,
+        'start_date': start_date,
+        'end_date': end_date,
+        'since': since,
+    }
+    df = pd.read_sql(TARGET_FRAME_QUERY, conn, params=params)
+    return df.astype({**TARGET_UPDATE_DTYPES, 'updated_at': 'datetime64[ns]'})
+
+
+# Rows of the recheck window after `since` that the cached `frame` does not already hold
+def _read_target_delta(conn, frame, practitioner_ids, start_date, end_date, since):
+    known = frame.loc[frame['updated_at'] > since, 'updated_at'].value_counts()
+    df = pd.read_sql(TARGET_FRAME_DELTA_QUERY, conn, params={
+        'practitioner_ids': practitioner_ids,
+        'start_date': start_date,
+        'end_date': end_date,
+        'since': since,
+        'known_times': [timestamp.to_pydatetime() for timestamp in known.index],
+        'known_counts': [int(count) for count in known.to_numpy()],
+    })
+    return df.astype({**TARGET_UPDATE_DTYPES, 'updated_at': 'datetime64[ns]'})
+
+
+# Per-practitioner row count and date checksum of a target frame, matching TARGET_FRAME_STATS_QUERY
+def target_frame_stats(frame):
+    epoch_seconds = frame['target_date'].astype('int64') // 10**9
+    return (
+        frame.assign(date_checksum=epoch_seconds)
+        .groupby('practitioner_id')
+        .agg(row_count=('target_date', 'size'), date_checksum=('date_checksum', 'sum'))
+    )
+
+
+# Vectorized upsert: rows of `delta` replace rows of `frame` with the same practitioner and date
+def upsert_target_rows(frame, delta):
+    if delta.empty:
+        return frame
+    merged = pd.concat([frame, delta], ignore_index=True)
+    merged = merged.drop_duplicates(['practitioner_id', 'target_date'], keep='last')
+    return merged.sort_values(['practitioner_name', 'target_date'], ignore_index=True)
+
+
+def load_target_frame(conn, practitioner_ids, start_date, end_date):
+    """Load the full consolidated targets of a selection and date range as a TargetFrame."""
+    practitioner_ids = [int(practitioner_id) for practitioner_id in practitioner_ids]
+    frame = _read_target_frame(conn, practitioner_ids, start_date, end_date)
+    conn.rollback()
+    return TargetFrame(practitioner_ids, start_date, end_date, frame, frame['updated_at'].max())
+
+
+def refresh_target_frame(conn, target_frame):
+    """
+    Bring a TargetFrame up to date: fetch only the rows written since its high-water mark (the
+    newest updated_at read from the server), rechecking the UPDATED_AT_LOOKBACK window before it by
+    updated_at batch, and upsert them. Then compare the per-practitioner row count and date
+    checksum with the server and reload just the practitioners that differ (deleted rows).
+    Returns the refreshed TargetFrame and the number of rows transferred.
+    """
+    practitioner_ids = target_frame.practitioner_ids
+    if pd.notna(target_frame.high_water_mark):
+        delta = _read_target_delta(
+            conn, target_frame.frame, practitioner_ids, target_frame.start_date, target_frame.end_date,
+            (target_frame.high_water_mark - UPDATED_AT_LOOKBACK).to_pydatetime(),
+        )
+    else:
+        delta = _read_target_frame(conn, practitioner_ids, target_frame.start_date, target_frame.end_date)
+    frame = upsert_target_rows(target_frame.frame, delta)
+    rows_transferred = len(delta)
+
+    server_stats = pd.read_sql(TARGET_FRAME_STATS_QUERY, conn, params={
+        'practitioner_ids': practitioner_ids,
+        'start_date': target_frame.start_date,
+        'end_date': target_frame.end_date,
+    }).set_index('practitioner_id')
+    local_stats = target_frame_stats(frame)
+    compared = server_stats.join(local_stats, how='outer', lsuffix='_server', rsuffix='_local')
+    differs = (
+        compared['row_count_server'].ne(compared['row_count_local'])
+        | compared['date_checksum_server'].ne(compared['date_checksum_local'])
+    )
+    stale_ids = compared.index[differs].astype('int64').tolist()
+    if stale_ids:
+        reloaded = _read_target_frame(conn, stale_ids, target_frame.start_date, target_frame.end_date)
+        kept = frame[~frame['practitioner_id'].isin(stale_ids)].reset_index(drop=True)
+        frame = upsert_target_rows(kept, reloaded)
+        rows_transferred += len(reloaded)
+    conn.rollback()
+
+    high_water_mark = max(
+        (value for value in (target_frame.high_water_mark, frame['updated_at'].max()) if pd.notna(value)),
+        default=None,
+    )
+    return TargetFrame(
+        practitioner_ids, target_frame.start_date, target_frame.end_date, frame, high_water_mark
+    ), rows_transferred
+
+
+# Latest week (Mon-Sun) of targets for the selected practitioners, keyed by practitioner_id and ISO weekday.
+# Shared by the clone preview and the clone statement so both see exactly the same source rows.
+# A fixed source week can be passed as source_week_start (NULL = latest week in the table).
+CLONE_SOURCE_CTE = """
+WITH latest_week AS (
+    SELECT COALESCE(%(source_week_start)s::timestamp, date_trunc('week', max(target_date))) AS week_start
+    FROM planning1.target_update
+),
+source_week AS (
+    SELECT t.practitioner_id, EXTRACT(ISODOW FROM t.target_date)::int AS iso_weekday, t.target_hour
+    FROM planning1.target_update AS t
+    CROSS JOIN latest_week AS w
+    WHERE t.target_date >= w.week_start
+      AND t.target_date < w.week_start + INTERVAL '7 days'
+      AND t.practitioner_id = ANY(%(practitioner_ids)s)
+)
+"""
+
+CLONE_PREVIEW_QUERY = CLONE_SOURCE_CTE + """
+SELECT w.week_start, p.practitioner_id, p.practitioner_name,
+""" + ",\n".join(
+    f'       max(s.target_hour) FILTER (WHERE s.iso_weekday = {iso_weekday}) AS "{day}"'
+    for iso_weekday, day in enumerate(DAYS_OF_WEEK, start=1)
+) + """
+FROM planning1.practitioner AS p
+CROSS JOIN latest_week AS w
+LEFT JOIN source_week AS s ON s.practitioner_id = p.practitioner_id
+WHERE p.practitioner_id = ANY(%(practitioner_ids)s)
+GROUP BY w.week_start, p.practitioner_id, p.practitioner_name
+ORDER BY p.practitioner_name, p.practitioner_id;
+"""
+
+# Weekday hours of the selected practitioners expanded over the range on the server
+SET_PLANNED_CTE = """
+WITH practitioners AS (
+    SELECT *
+    FROM unnest(%(practitioner_ids)s::int[], %(practitioner_names)s::text[]) AS p(practitioner_id, practitioner_name)
+),
+target_days AS (
+    SELECT d::timestamp AS target_date, (%(weekday_hours)s::double precision[])[EXTRACT(ISODOW FROM d)::int] AS target_hour
+    FROM generate_series(%(start_date)s::date, %(end_date)s::date, INTERVAL '1 day') AS d
+),
+planned AS (
+    SELECT p.practitioner_id, p.practitioner_name, td.target_date, td.target_hour
+    FROM practitioners AS p
+    CROSS JOIN target_days AS td
+    WHERE td.target_hour IS NOT NULL
+)
+"""
+
+# The source week cloned onto every matching weekday of the range
+CLONE_PLANNED_CTE = CLONE_SOURCE_CTE + """,
+target_days AS (
+    SELECT d::timestamp AS target_date, EXTRACT(ISODOW FROM d)::int AS iso_weekday
+    FROM generate_series(%(start_date)s::date, %(end_date)s::date, INTERVAL '1 day') AS d
+),
+planned AS (
+    SELECT s.practitioner_id, p.practitioner_name, td.target_date, s.target_hour
+    FROM source_week AS s
+    JOIN target_days AS td ON td.iso_weekday = s.iso_weekday
+    JOIN planning1.practitioner AS p ON p.practitioner_id = s.practitioner_id
+)
+"""
+
+# Classify every planned row: holidays are skipped first, then existing targets are conflicts
+PLAN_OUTCOME_CTE = """,
+outcome AS (
+    SELECT
+        pl.practitioner_id, pl.practitioner_name, pl.target_date, pl.target_hour,
+        t.target_hour AS current_hour,
+        CASE
+            WHEN h.holiday_date IS NOT NULL THEN 'holiday'
+            WHEN t.practitioner_id IS NOT NULL THEN 'conflict'
+            ELSE 'insert'
+        END AS status
+    FROM planned AS pl
+    LEFT JOIN planning1.statutory_holidays AS h ON h.holiday_date = pl.target_date::date
+    LEFT JOIN planning1.target_update AS t
+        ON t.practitioner_id = pl.practitioner_id AND t.target_date = pl.target_date
+)
+"""
+
+# Planned rows of each operation and the source week they were cloned from
+PLANNED_CTES = {'set': SET_PLANNED_CTE, 'clone': CLONE_PLANNED_CTE}
+PLAN_SOURCE_WEEK = {'set': "NULL::timestamp", 'clone': "(SELECT week_start FROM latest_week)"}
+
+# One row per practitioner with the counts of each outcome and the holiday dates skipped
+PLAN_SUMMARY_SELECT = """
+SELECT
+    o.practitioner_id, o.practitioner_name,
+    count(*) FILTER (WHERE o.status = 'insert') AS to_insert,
+    count(*) FILTER (WHERE o.status = 'conflict') AS conflicts,
+    count(*) FILTER (WHERE o.status = 'holiday') AS holidays_skipped,
+    COALESCE(sum(o.target_hour) FILTER (WHERE o.status = 'insert'), 0) AS hours_to_insert,
+    array_agg(DISTINCT o.target_date::date) FILTER (WHERE o.status = 'holiday') AS holiday_dates,
+    {source_week} AS source_week_start
+FROM outcome AS o
+GROUP BY o.practitioner_id, o.practitioner_name
+ORDER BY o.practitioner_name, o.practitioner_id;
+"""
+
+# Every planned row with its planned target_hour, the current_hour of an existing target and its status
+PLAN_DETAIL_SELECT = """
+SELECT o.*
+FROM outcome AS o
+ORDER BY o.practitioner_name, o.practitioner_id, o.target_date;
+"""
+
+# Insert the 'insert' rows; the totals let the caller check them against the plan
+PLAN_APPLY_SELECT = """,
+inserted AS (
+    INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
+    SELECT practitioner_id, practitioner_name, target_date, target_hour, %(updated_at)s
+    FROM outcome
+    WHERE status = 'insert'
+    ON CONFLICT (practitioner_id, target_date) DO NOTHING
+    RETURNING target_hour
+)
+SELECT
+    (SELECT count(*) FROM inserted) AS records_inserted,
+    (SELECT COALESCE(sum(target_hour), 0) FROM inserted) AS hours_inserted,
+    (SELECT count(*) FROM outcome WHERE status <> 'holiday') AS records_planned,
+    (SELECT count(*) FROM outcome WHERE status = 'conflict') AS conflicts,
+    (SELECT array_agg(DISTINCT target_date::date ORDER BY target_date::date) FROM outcome WHERE status = 'holiday') AS holidays_skipped;
+"""
+
+
+# Statement of an operation: its planned rows and outcome, followed by `select`
+def plan_query(operation, select):
+    return PLANNED_CTES[operation] + PLAN_OUTCOME_CTE + select.replace("{source_week}", PLAN_SOURCE_WEEK[operation])
+
+
+def _read_plan(conn, operation, params):
+    summary = pd.read_sql(plan_query(operation, PLAN_SUMMARY_SELECT), conn, params=params)
+    conn.rollback()
+    source_week_start = summary['source_week_start'].iloc[0] if not summary.empty else params.get('source_week_start')
+    holidays_skipped = sorted({day for days in summary['holiday_dates'] if days is not None for day in days})
+    summary = summary.drop(columns=['holiday_dates', 'source_week_start']).astype({
+        'practitioner_id': 'int64',
+        'to_insert': 'int64',
+        'conflicts': 'int64',
+        'holidays_skipped': 'int64',
+        'hours_to_insert': 'float64',
+    })
+    return TargetPlan(operation, params, summary, holidays_skipped, source_week_start)
+
+
+def plan_set_targets(conn, practitioners, start_date, end_date, target_hours):
+    """
+    Plan a set operation in one read query: per practitioner, the targets that would be inserted,
+    the dates that already have a target and the statutory holidays skipped. Nothing is written.
+    `target_hours` is a {weekday name: hours} dict.
+    """
+    return _read_plan(conn, 'set', {
+        'practitioner_ids': [int(practitioner['practitioner_id']) for practitioner in practitioners],
+        'practitioner_names': [practitioner['practitioner_name'] for practitioner in practitioners],
+        'weekday_hours': [target_hours.get(day) for day in DAYS_OF_WEEK],
+        'start_date': start_date,
+        'end_date': end_date,
+    })
+
+
+def plan_clone_targets(conn, practitioner_ids, start_date, end_date, source_week_start=None):
+    """Plan a clone of the latest week (or the week starting at source_week_start) in one read query."""
+    return _read_plan(conn, 'clone', {
+        'practitioner_ids': [int(practitioner_id) for practitioner_id in practitioner_ids],
+        'source_week_start': source_week_start,
+        'start_date': start_date,
+        'end_date': end_date,
+    })
+
+
+def load_plan_detail(conn, plan):
+    """Row-level detail of a plan (one row per practitioner and date), evaluated against the current targets."""
+    detail = pd.read_sql(plan_query(plan.operation, PLAN_DETAIL_SELECT), conn, params=plan.params)
+    conn.rollback()
+    return detail.astype({
+        'practitioner_id': 'int64',
+        'target_date': 'datetime64[ns]',
+        'target_hour': 'float64',
+        'current_hour': 'float64',
+    })
+
+
+def apply_plan(conn, plan, dry_run=False):
+    """
+    Insert the plan's targets in one statement and transaction. If the targets it inserts, or the
+    existing targets it keeps, no longer match the plan because someone changed the table since
+    planning, nothing is written and StalePlanError is raised.
+    """
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute(plan_query(plan.operation, PLAN_APPLY_SELECT), {**plan.params, 'updated_at': datetime.now()})
+            records_inserted, hours_inserted, records_planned, conflicts, holidays_skipped = cursor.fetchone()
+        if (records_inserted != plan.records_to_insert or conflicts != plan.conflicts
+                or not math.isclose(hours_inserted, plan.hours_to_insert, abs_tol=1e-6)):
+            raise StalePlanError(
+                "Targets in the selected period changed after the plan was made; nothing was written. Please plan again."
+            )
+
+    return InsertResult(
+        records_planned=records_planned,
+        records_inserted=records_inserted,
+        holidays_skipped=holidays_skipped or [],
+        dry_run=dry_run,
+    )
+
+
+# Monday of the latest week that has any target, or None when the table is empty
+def load_latest_week_start(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT date_trunc('week', max(target_date)) FROM planning1.target_update;")
+        week_start = cursor.fetchone()[0]
+    conn.rollback()
+    return week_start
+
+
+# Create the yearly target_update partitions covering start_date..end_date (requires Partition_target_update.sql)
+def create_target_partitions(conn, start_date, end_date):
+    with transaction(conn):
+        with conn.cursor() as cursor:
+            for year in range(start_date.year, end_date.year + 1):
+                cursor.execute("SELECT planning1.create_target_update_partition(%s);", (year,))
+
+
+# Preview the latest available week (Mon-Sun) per practitioner; one row per practitioner, one column per weekday
+def preview_clone(conn, practitioner_ids, source_week_start=None):
+    params = {
+        'practitioner_ids': [int(practitioner_id) for practitioner_id in practitioner_ids],
+        'source_week_start': source_week_start,
+    }
+    preview_df = pd.read_sql(CLONE_PREVIEW_QUERY, conn, params=params)
+    conn.rollback()
+    return preview_df
+
+
+# Clone the latest week (or the week starting at source_week_start) onto start_date..end_date without a
+# separate plan; insert, conflicts and holiday exclusion happen in one statement built on the plan's CTEs
+def clone_targets(conn, practitioner_ids, start_date, end_date, dry_run=False, source_week_start=None):
+    params = {
+        'practitioner_ids': [int(practitioner_id) for practitioner_id in practitioner_ids],
+        'source_week_start': source_week_start,
+        'start_date': start_date,
+        'end_date': end_date,
+        'updated_at': datetime.now(),
+    }
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute(plan_query('clone', PLAN_APPLY_SELECT), params)
+            records_cloned, _, records_planned, _, holidays_skipped = cursor.fetchone()
+
+    return InsertResult(
+        records_planned=records_planned,
+        records_inserted=records_cloned,
+        holidays_skipped=holidays_skipped or [],
+        dry_run=dry_run,
+    )
+
+
+# Compare the edited grid with the original data and return the changed rows as update records
+# (values are compared and returned in float64, exactly as typed)
+def diff_target_hours(original_df, edited_df):
+    keys = ['practitioner_id', 'target_date']
+    merged = edited_df[keys + ['target_hour']].merge(
+        original_df[keys + ['target_hour']], on=keys, how='inner', suffixes=('', '_original')
+    )
+    changed = merged['target_hour'].notna() & merged['target_hour'].ne(merged['target_hour_original'])
+    return merged.loc[changed, keys + ['target_hour']].to_dict('records')
+
+
+# Keys of the cells that were emptied in the edited grid while the original had a value
+def cleared_target_hours(original_df, edited_df):
+    keys = ['practitioner_id', 'target_date']
+    merged = edited_df[keys + ['target_hour']].merge(
+        original_df[keys + ['target_hour']], on=keys, how='inner', suffixes=('', '_original')
+    )
+    cleared = merged['target_hour'].isna() & merged['target_hour_original'].notna()
+    return merged.loc[cleared, keys].to_dict('records')
+
+
+# Update target_hour in the database in chunks of `page_size` rows
+def update_target_hours(conn, updates, page_size=UPDATE_PAGE_SIZE, dry_run=False):
+    # Join the new values to the table so each chunk is a single UPDATE statement
+    query = """
+    UPDATE planning1.target_update AS t
+    SET target_hour = v.target_hour, updated_at = v.updated_at
+    FROM (VALUES %s) AS v(practitioner_id, target_date, target_hour, updated_at)
+    WHERE t.practitioner_id = v.practitioner_id AND t.target_date = v.target_date;
+    """
+    template = "(%s::int, %s::timestamp, %s::double precision, %s::timestamp)"
+
+    # Convert updates to a list of tuples for batch execution
+    now = datetime.now()
+    update_values = [
+        (int(update['practitioner_id']), update['target_date'], float(update['target_hour']), now)
+        for update in updates
+    ]
+
+    rows_updated = 0
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            # Execute the batch update one chunk at a time
+            for offset in range(0, len(update_values), page_size):
+                chunk = update_values[offset:offset + page_size]
+                execute_values(cursor, query, chunk, template=template, page_size=len(chunk))
+                rows_updated += cursor.rowcount
+    return UpdateResult(rows_updated=rows_updated, dry_run=dry_run)
+
+
+# Set the same target_hour for every existing target of a group in a date range, entirely on the server
+def update_target_hours_range(conn, practitioner_ids, start_date, end_date, target_hour, dry_run=False):
+    query = """
+    UPDATE planning1.target_update
+    SET target_hour = %s, updated_at = %s
+    WHERE practitioner_id = ANY(%s) AND target_date BETWEEN %s AND %s;
+    """
+    practitioner_ids = [int(practitioner_id) for practitioner_id in practitioner_ids]
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute(query, (float(target_hour), datetime.now(), practitioner_ids, start_date, end_date))
+            rows_updated = cursor.rowcount
+    return UpdateResult(rows_updated=rows_updated, dry_run=dry_run)
+
+
+# Delete individual targets identified by practitioner_id and target_date in a single statement
+def delete_target_hours(conn, deletion_records, dry_run=False):
+    query = """
+    DELETE FROM planning1.target_update AS t
+    USING unnest(%s::int[], %s::timestamp[]) AS d(practitioner_id, target_date)
+    WHERE t.practitioner_id = d.practitioner_id AND t.target_date = d.target_date;
+    """
+
+    # Send the selected keys as two parallel arrays
+    practitioner_ids = [int(record['practitioner_id']) for record in deletion_records]
+    target_dates = [pd.Timestamp(record['target_date']).to_pydatetime() for record in deletion_records]
+
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute(query, (practitioner_ids, target_dates))
+            rows_deleted = cursor.rowcount
+    return DeleteResult(rows_deleted=rows_deleted, dry_run=dry_run)
+
+
+# Delete every target of a group of practitioners in a date range in a single statement
+def delete_target_hours_range(conn, practitioner_ids, start_date, end_date, dry_run=False):
+    query = """
+    DELETE FROM planning1.target_update
+    WHERE practitioner_id = ANY(%s) AND target_date BETWEEN %s AND %s;
+    """
+    practitioner_ids = [int(practitioner_id) for practitioner_id in practitioner_ids]
+    with transaction(conn, dry_run):
+        with conn.cursor() as cursor:
+            cursor.execute(query, (practitioner_ids, start_date, end_date))
+            rows_deleted = cursor.rowcount
+    return DeleteResult(rows_deleted=rows_deleted, dry_run=dry_run)
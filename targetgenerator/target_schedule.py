@@ -0,0 +1,68 @@
+from typing import NamedTuple
+
+import numpy as np
+
+DAYS_OF_WEEK = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# Expanded practitioner x date target grid, flattened in practitioner then date order
+class TargetGrid(NamedTuple):
+    practitioner_index: np.ndarray  # position of each row's practitioner in the input id list
+    practitioner_ids: np.ndarray    # int64
+    target_dates: np.ndarray        # datetime64[D]
+    target_hours: np.ndarray        # float64
+    holidays_skipped: np.ndarray    # datetime64[D], one entry per practitioner and skipped holiday
+
+    def __len__(self):
+        return len(self.target_dates)
+
+
+# Integer weekday (Monday=0 ... Sunday=6) for an array of datetime64[D] values
+def weekday_numbers(dates):
+    # 1970-01-01 was a Thursday (weekday 3)
+    return (dates.astype('int64') + 3) % 7
+
+
+# Build a practitioners x 7 hours matrix (NaN = no target on that weekday)
+def weekday_hours_matrix(weekday_hours, practitioner_count):
+    if isinstance(weekday_hours, dict):
+        row = np.full(7, np.nan)
+        for day, hours in weekday_hours.items():
+            row[DAYS_OF_WEEK.index(day)] = float(hours)
+        return np.broadcast_to(row, (practitioner_count, 7))
+
+    matrix = np.asarray(weekday_hours, dtype='float64')
+    if matrix.shape != (practitioner_count, 7):
+        raise ValueError(f"Expected a ({practitioner_count}, 7) weekday hours matrix, got {matrix.shape}")
+    return matrix
+
+
+def expand_schedule(start_date, end_date, weekday_hours, holidays, practitioner_ids):
+    """
+    Expand a weekday schedule into the full target grid between start_date and end_date (inclusive).
+    Used to generate the synthetic history; set and clone expand their schedules on the server
+    (SET_PLANNED_CTE and CLONE_PLANNED_CTE in target_operations), with the same holiday rule.
+
+    `weekday_hours` is either a {weekday name: hours} dict shared by every practitioner or a
+    practitioners x 7 array (Monday first) with NaN for days without a target. Dates in
+    `holidays` are excluded and reported in `holidays_skipped`.
+    """
+    practitioner_ids = np.asarray([int(practitioner_id) for practitioner_id in practitioner_ids], dtype='int64')
+    dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    hours_matrix = weekday_hours_matrix(weekday_hours, len(practitioner_ids))
+
+    # practitioners x dates hours, NaN where the weekday has no target
+    grid = hours_matrix[:, weekday_numbers(dates)]
+    scheduled = ~np.isnan(grid)
+    is_holiday = np.isin(dates, np.array(sorted(holidays), dtype='datetime64[D]'))
+
+    practitioner_index, date_index = np.nonzero(scheduled & ~is_holiday)
+    _, skipped_index = np.nonzero(scheduled & is_holiday)
+
+    return TargetGrid(
+        practitioner_index=practitioner_index,
+        practitioner_ids=practitioner_ids[practitioner_index],
+        target_dates=dates[date_index],
+        target_hours=grid[practitioner_index, date_index],
+        holidays_skipped=dates[skipped_index],
+    )
@@ -0,0 +1,237 @@
+"""
+Local DuckDB mirror of planning1.target_update and planning1.practitioner for read-only views.
+
+refresh() copies only target rows whose updated_at is newer than the newest row already mirrored.
+The UPDATED_AT_LOOKBACK window before it is rechecked for rows committed out of order, but rows in it
+are only copied again when their updated_at batch has a different row count than the mirror's, so
+recent writes are not pulled again on every refresh. The small practitioner table is
+reloaded in full, so name, location and manager changes show up at once. Deletes leave no
+updated_at trace; at most once per `reconcile_seconds` the per-practitioner row count and
+date checksum are compared with Postgres, and practitioners that differ are reloaded.
+Requires the optional duckdb package.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+from db import UPDATED_AT_LOOKBACK
+from target_operations import TARGET_UPDATE_DTYPES, empty_target_updates
+
+# Minimum seconds between delete reconciliations against Postgres
+SNAPSHOT_RECONCILE_SECONDS = int(os.getenv("TARGET_SNAPSHOT_RECONCILE_SECONDS", "3600"))
+
+# Rows fetched per round trip when copying targets from Postgres
+SNAPSHOT_CHUNK_ROWS = 50000
+
+TARGET_COLUMNS = ['practitioner_id', 'target_date', 'target_hour', 'updated_at']
+PRACTITIONER_COLUMNS = ['practitioner_id', 'practitioner_name', 'clinic_location', 'manager_name']
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS target_update (
+    practitioner_id INTEGER NOT NULL,
+    target_date TIMESTAMP NOT NULL,
+    target_hour DOUBLE,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (practitioner_id, target_date)
+);
+CREATE TABLE IF NOT EXISTS practitioner (
+    practitioner_id INTEGER PRIMARY KEY,
+    practitioner_name VARCHAR,
+    clinic_location VARCHAR,
+    manager_name VARCHAR
+);
+CREATE TABLE IF NOT EXISTS snapshot_state (
+    name VARCHAR PRIMARY KEY,
+    value DOUBLE
+);
+"""
+
+# Target rows after `since` whose updated_at batch is new or has a different row count than the
+# mirror's (known_times/known_counts); every write stamps its rows with one updated_at
+SNAPSHOT_DELTA_QUERY = """
+WITH recent AS (
+    SELECT practitioner_id, target_date, target_hour, updated_at
+    FROM planning1.target_update
+    WHERE updated_at > %(since)s::timestamp
+),
+known AS (
+    SELECT * FROM unnest(%(known_times)s::timestamp[], %(known_counts)s::bigint[]) AS k(updated_at, row_count)
+),
+changed AS (
+    SELECT r.updated_at
+    FROM recent AS r
+    GROUP BY r.updated_at
+    HAVING count(*) <> COALESCE((SELECT k.row_count FROM known AS k WHERE k.updated_at = r.updated_at), 0)
+)
+SELECT * FROM recent
+WHERE updated_at IN (SELECT updated_at FROM changed);
+"""
+
+# Per-practitioner row count and date checksum, computed the same way on both sides
+RECONCILE_QUERY = """
+SELECT practitioner_id, count(*) AS row_count, sum(extract(epoch FROM target_date))::BIGINT AS date_checksum
+FROM {table}
+GROUP BY practitioner_id
+"""
+
+
+# Outcome of one snapshot refresh
+@dataclass
+class SnapshotRefresh:
+    rows_copied: int = 0
+    practitioners_reloaded: int = 0
+    reconciled: bool = False
+    high_water_mark: object = None
+
+
+class TargetSnapshot:
+    def __init__(self, path, reconcile_seconds=SNAPSHOT_RECONCILE_SECONDS):
+        import duckdb
+
+        self._db = duckdb.connect(path)
+        self._db.execute(SNAPSHOT_SCHEMA)
+        self._reconcile_seconds = reconcile_seconds
+        self._lock = threading.Lock()
+
+    # A separate DuckDB connection to the same file for the calling thread
+    def _cursor(self):
+        return self._db.cursor()
+
+    def high_water_mark(self):
+        return self._cursor().execute("SELECT max(updated_at) FROM target_update;").fetchone()[0]
+
+    def _copy_targets(self, cursor, pg_conn, query, params, table="target_update"):
+        """Stream target rows from Postgres into `table`, replacing rows with the same key."""
+        rows_copied = 0
+        with pg_conn.cursor(name='target_snapshot') as pg_cursor:
+            pg_cursor.itersize = SNAPSHOT_CHUNK_ROWS
+            pg_cursor.execute(query, params)
+            while True:
+                rows = pg_cursor.fetchmany(SNAPSHOT_CHUNK_ROWS)
+                if not rows:
+                    break
+                chunk = pd.DataFrame.from_records(rows, columns=TARGET_COLUMNS)
+                cursor.register('target_chunk', chunk)
+                cursor.execute(f"INSERT OR REPLACE INTO {table} SELECT * FROM target_chunk;")
+                cursor.unregister('target_chunk')
+                rows_copied += len(rows)
+        return rows_copied
+
+    def _copy_delta(self, cursor, pg_conn, since):
+        """Copy the rows after `since` whose updated_at batch the mirror does not already hold in full."""
+        known = cursor.execute(
+            "SELECT updated_at, count(*) FROM target_update WHERE updated_at > ? GROUP BY updated_at;", [since]
+        ).fetchall()
+        return self._copy_targets(cursor, pg_conn, SNAPSHOT_DELTA_QUERY, {
+            'since': since,
+            'known_times': [updated_at for updated_at, _ in known],
+            'known_counts': [row_count for _, row_count in known],
+        })
+
+    def _reconcile(self, cursor, pg_conn):
+        """Reload the practitioners whose row count or date checksum differs from Postgres."""
+        remote_df = pd.read_sql(RECONCILE_QUERY.format(table="planning1.target_update"), pg_conn)
+        local_df = cursor.execute(RECONCILE_QUERY.format(table="target_update")).df()
+        merged = remote_df.merge(local_df, on='practitioner_id', how='outer', suffixes=('_remote', '_local'))
+        differs = (
+            merged['row_count_remote'].ne(merged['row_count_local'])
+            | merged['date_checksum_remote'].ne(merged['date_checksum_local'])
+        )
+        practitioner_ids = merged.loc[differs, 'practitioner_id'].astype('int64').tolist()
+        if practitioner_ids:
+            # Stage their current rows, drop the local rows that no longer exist, then replace the rest.
+            # Rows are never deleted and re-inserted under the same key within the transaction.
+            cursor.execute("""
+            CREATE OR REPLACE TEMP TABLE reloaded_target (
+                practitioner_id INTEGER NOT NULL,
+                target_date TIMESTAMP NOT NULL,
+                target_hour DOUBLE,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (practitioner_id, target_date)
+            );
+            """)
+            self._copy_targets(cursor, pg_conn, """
+            SELECT practitioner_id, target_date, target_hour, updated_at
+            FROM planning1.target_update
+            WHERE practitioner_id = ANY(%s);
+            """, (practitioner_ids,), table="reloaded_target")
+            cursor.execute("""
+            DELETE FROM target_update AS t
+            WHERE list_contains(?, t.practitioner_id)
+              AND NOT EXISTS (
+                  SELECT 1 FROM reloaded_target AS r
+                  WHERE r.practitioner_id = t.practitioner_id AND r.target_date = t.target_date
+              );
+            """, [practitioner_ids])
+            cursor.execute("INSERT OR REPLACE INTO target_update SELECT * FROM reloaded_target;")
+            cursor.execute("DROP TABLE reloaded_target;")
+        self._mark_reconciled(cursor)
+        return len(practitioner_ids)
+
+    def _mark_reconciled(self, cursor):
+        cursor.execute("INSERT OR REPLACE INTO snapshot_state VALUES ('reconciled_at', ?);", [time.time()])
+
+    def refresh(self, pg_conn):
+        """Bring the snapshot up to date with Postgres; `pg_conn` is only read from."""
+        with self._lock:
+            cursor = self._cursor()
+            result = SnapshotRefresh()
+            since = self.high_water_mark()
+            reconciled_at = cursor.execute(
+                "SELECT value FROM snapshot_state WHERE name = 'reconciled_at';"
+            ).fetchone()
+
+            cursor.execute("BEGIN TRANSACTION;")
+            try:
+                practitioners_df = pd.read_sql(
+                    f"SELECT {', '.join(PRACTITIONER_COLUMNS)} FROM planning1.practitioner;", pg_conn
+                )
+                cursor.register('practitioner_frame', practitioners_df)
+                cursor.execute("DELETE FROM practitioner;")
+                cursor.execute("INSERT INTO practitioner SELECT * FROM practitioner_frame;")
+                cursor.unregister('practitioner_frame')
+
+                if since is None:
+                    result.rows_copied = self._copy_targets(cursor, pg_conn, """
+                    SELECT practitioner_id, target_date, target_hour, updated_at
+                    FROM planning1.target_update;
+                    """, None)
+                else:
+                    result.rows_copied = self._copy_delta(cursor, pg_conn, since - UPDATED_AT_LOOKBACK)
+
+                # An empty snapshot was just loaded in full, so it is already reconciled
+                reconcile_due = reconciled_at is None or time.time() - reconciled_at[0] >= self._reconcile_seconds
+                if since is None:
+                    self._mark_reconciled(cursor)
+                elif reconcile_due:
+                    result.practitioners_reloaded = self._reconcile(cursor, pg_conn)
+                    result.reconciled = True
+                cursor.execute("COMMIT;")
+            except Exception:
+                cursor.execute("ROLLBACK;")
+                raise
+            finally:
+                pg_conn.rollback()
+
+            result.high_water_mark = self.high_water_mark()
+            return result
+
+    def load_target_updates_many(self, practitioner_ids, start_date, end_date):
+        """Same frame as target_operations.load_target_updates_many, answered from the snapshot."""
+        practitioner_ids = [int(practitioner_id) for practitioner_id in practitioner_ids]
+        if not practitioner_ids:
+            return empty_target_updates()
+
+        df = self._cursor().execute("""
+        SELECT p.practitioner_id, p.practitioner_name, t.target_date, t.target_hour
+        FROM target_update AS t
+        JOIN practitioner AS p ON t.practitioner_id = p.practitioner_id
+        WHERE list_contains(?, t.practitioner_id) AND t.target_date BETWEEN ? AND ?
+        ORDER BY p.practitioner_name, t.target_date;
+        """, [practitioner_ids, pd.Timestamp(start_date), pd.Timestamp(end_date)]).df()
+        if df.empty:
+            return empty_target_updates()
+        return df.astype(TARGET_UPDATE_DTYPES)
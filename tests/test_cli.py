@@ -0,0 +1,22 @@
+import argparse
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("psycopg2")
+
+from cli import parse_weekday_hours  # noqa: E402
+
+
+def test_parse_weekday_hours():
+    assert parse_weekday_hours(["Monday=7", "friday=6.5", " saturday=0"]) == {
+        'Monday': 7.0,
+        'Friday': 6.5,
+        'Saturday': 0.0,
+    }
+
+
+@pytest.mark.parametrize("value", ["Mon=7", "Monday", "Monday=", "Monday=seven"])
+def test_parse_weekday_hours_rejects_bad_values(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_weekday_hours([value])
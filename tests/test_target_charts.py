@@ -0,0 +1,61 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("matplotlib")
+
+from target_charts import build_chart_frames, downsample  # noqa: E402
+
+PRACTITIONERS = pd.DataFrame({
+    'practitioner_id': [1, 2, 3],
+    'practitioner_name': ['Ann', 'Bob', 'Cy'],
+    'clinic_location': ['North', 'North', 'South'],
+    'manager_name': ['Mia', 'Mia', 'Mia'],
+})
+
+
+def consolidated(days=4):
+    dates = pd.date_range('2026-01-05', periods=days)
+    return pd.DataFrame([
+        {'practitioner_id': practitioner_id, 'target_date': target_date, 'target_hour': float(practitioner_id)}
+        for practitioner_id in (1, 2, 3)
+        for target_date in dates
+    ])
+
+
+def test_downsample_within_budget_is_unchanged():
+    frame = pd.DataFrame({'a': [1.0, 2.0, 3.0]}, index=pd.date_range('2026-01-05', periods=3))
+    sampled, step = downsample(frame, point_budget=3)
+    assert step == 1
+    assert sampled is frame
+
+
+def test_downsample_averages_consecutive_dates():
+    index = pd.date_range('2026-01-05', periods=5)
+    frame = pd.DataFrame({'a': [1.0, 3.0, 5.0, 7.0, 9.0], 'b': [0.0] * 5}, index=index)
+
+    sampled, step = downsample(frame, point_budget=4)
+
+    assert step == 3
+    assert sampled['a'].tolist() == [3.0, 8.0]
+    assert sampled.index.tolist() == [index[0], index[3]]
+
+
+def test_build_chart_frames_by_practitioner():
+    lines, band, step = build_chart_frames(consolidated(), PRACTITIONERS, "Practitioner")
+    assert list(lines.columns) == ['Ann', 'Bob', 'Cy']
+    assert len(lines) == 4
+    assert band is None and step == 1
+
+
+def test_build_chart_frames_location_mean():
+    lines, _, _ = build_chart_frames(consolidated(), PRACTITIONERS, "Location mean")
+    assert lines.iloc[0].to_dict() == {'North': 1.5, 'South': 3.0}
+
+
+def test_build_chart_frames_band_is_downsampled():
+    lines, (p10, p90), step = build_chart_frames(consolidated(days=10), PRACTITIONERS, "P10-P90 band", point_budget=5)
+    assert step == 6
+    assert list(lines.columns) == ['median']
+    assert lines['median'].tolist() == [2.0, 2.0]
+    assert p10.tolist() == pytest.approx([1.2, 1.2])
+    assert p90.tolist() == pytest.approx([2.8, 2.8])
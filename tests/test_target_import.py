@@ -0,0 +1,110 @@
+"""
+Tests of the import validation, and an integration test of merge_targets against a scratch database
+with Database/Create.sql and Database/Partition_target_update.sql applied. Set TEST_DB_NAME to run
+the latter (the other DB_* settings are shared with the app); it runs in one transaction that is
+rolled back.
+"""
+import os
+from datetime import date, datetime
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+psycopg2 = pytest.importorskip("psycopg2")
+
+import db  # noqa: E402
+from target_import import merge_targets, validate_targets  # noqa: E402
+
+TEST_DB_NAME = os.getenv("TEST_DB_NAME", "")
+PRACTITIONER_ID = 2_000_000_001
+
+requires_db = pytest.mark.skipif(not TEST_DB_NAME, reason="TEST_DB_NAME is not set")
+
+
+@pytest.fixture
+def conn():
+    settings = db.connection_settings()
+    settings['dbname'] = TEST_DB_NAME
+    conn = psycopg2.connect(**settings)
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def target_frame(rows):
+    return pd.DataFrame({
+        'practitioner_id': [row[0] for row in rows],
+        'target_date': pd.to_datetime([row[1] for row in rows]),
+        'target_hour': [row[2] for row in rows],
+    })
+
+
+def test_validate_targets_reports_first_error_per_row():
+    upload = pd.DataFrame({
+        'practitioner_id': ['1', '1', 'x', '9', '2', '2', '2', '1'],
+        'target_date': ['2026-01-05', '2026-01-06', '2026-01-05', '2026-01-05', 'not a date',
+                        '2026-01-01', '2026-01-07', '2026-01-06'],
+        'target_hour': ['7', '25', '7', '7', '7', '7', 'seven', '6.5'],
+    })
+    valid_df, rejected_df = validate_targets(upload, [1, 2], {date(2026, 1, 1)})
+
+    assert rejected_df['error'].tolist() == [
+        "target_hour outside 0-24",
+        "Invalid practitioner_id",
+        "Unknown practitioner_id",
+        "Invalid target_date",
+        "Statutory holiday",
+        "Invalid target_hour",
+    ]
+    assert valid_df.to_dict('records') == [
+        {'practitioner_id': 1, 'target_date': pd.Timestamp('2026-01-05'), 'target_hour': 7.0},
+        {'practitioner_id': 1, 'target_date': pd.Timestamp('2026-01-06'), 'target_hour': 6.5},
+    ]
+
+
+def test_validate_targets_keeps_the_last_duplicate():
+    upload = pd.DataFrame({
+        'practitioner_id': [1, 1],
+        'target_date': ['2026-01-05', '2026-01-05'],
+        'target_hour': [7, 6],
+    })
+    valid_df, rejected_df = validate_targets(upload, [1], set())
+
+    assert valid_df['target_hour'].tolist() == [6.0]
+    assert rejected_df['error'].str.startswith("Duplicate row").tolist() == [True]
+
+
+def test_validate_targets_requires_columns():
+    with pytest.raises(ValueError, match="target_hour"):
+        validate_targets(pd.DataFrame({'practitioner_id': [1], 'target_date': ['2026-01-05']}), [1], set())
+
+
+@requires_db
+def test_merge_targets_on_partitioned_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'planning1.target_update'::regclass;")
+        assert cursor.fetchone()[0] == 'p', "Apply Database/Partition_target_update.sql to the test database"
+
+        cursor.execute(
+            "INSERT INTO planning1.practitioner (practitioner_id, practitioner_name) VALUES (%s, 'Import Test');",
+            (PRACTITIONER_ID,),
+        )
+        cursor.execute("""
+        INSERT INTO planning1.target_update (practitioner_id, practitioner_name, target_date, target_hour, updated_at)
+        VALUES (%s, 'Import Test', '2024-06-03', 7.0, now());
+        """, (PRACTITIONER_ID,))
+
+    rows = [(PRACTITIONER_ID, '2024-06-03', 8.0), (PRACTITIONER_ID, '2024-06-04', 6.0)]
+    assert merge_targets(conn, target_frame(rows), datetime.now()) == (1, 0)
+
+    rows.append((PRACTITIONER_ID, '2025-01-06', 5.0))
+    assert merge_targets(conn, target_frame(rows), datetime.now(), overwrite=True) == (1, 2)
+
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        SELECT target_date::DATE::TEXT, target_hour FROM planning1.target_update
+        WHERE practitioner_id = %s ORDER BY target_date;
+        """, (PRACTITIONER_ID,))
+        assert cursor.fetchall() == [('2024-06-03', 8.0), ('2024-06-04', 6.0), ('2025-01-06', 5.0)]
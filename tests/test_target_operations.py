@@ -0,0 +1,78 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("psycopg2")
+
+import target_operations as ops  # noqa: E402
+
+
+def target_frame(rows):
+    return pd.DataFrame(rows, columns=['practitioner_id', 'practitioner_name', 'target_date', 'target_hour']).astype(
+        {'target_date': 'datetime64[ns]', 'target_hour': 'float64'}
+    )
+
+
+ORIGINAL = target_frame([
+    (1, 'Ann', '2026-01-05', 7.0),
+    (1, 'Ann', '2026-01-06', 7.0),
+    (2, 'Bob', '2026-01-05', 6.0),
+    (2, 'Bob', '2026-01-06', None),
+])
+
+
+def test_diff_target_hours_returns_changed_cells_only():
+    edited = ORIGINAL.copy()
+    edited.loc[0, 'target_hour'] = 7.1
+    edited.loc[1, 'target_hour'] = None  # cleared, not an update
+    edited.loc[3, 'target_hour'] = 5.0
+
+    updates = ops.diff_target_hours(ORIGINAL, edited)
+
+    assert [(update['practitioner_id'], str(update['target_date'].date()), update['target_hour'])
+            for update in updates] == [(1, '2026-01-05', 7.1), (2, '2026-01-06', 5.0)]
+
+
+def test_diff_target_hours_ignores_reordered_rows():
+    assert ops.diff_target_hours(ORIGINAL, ORIGINAL.iloc[::-1]) == []
+
+
+def test_cleared_target_hours():
+    edited = ORIGINAL.copy()
+    edited.loc[1, 'target_hour'] = None
+    edited.loc[3, 'target_hour'] = None  # was already empty
+
+    cleared = ops.cleared_target_hours(ORIGINAL, edited)
+
+    assert [(record['practitioner_id'], str(record['target_date'].date())) for record in cleared] == [
+        (1, '2026-01-06'),
+    ]
+
+
+def test_upsert_target_rows_replaces_and_sorts():
+    delta = target_frame([
+        (2, 'Bob', '2026-01-06', 4.0),
+        (1, 'Ann', '2026-01-07', 7.0),
+    ])
+
+    merged = ops.upsert_target_rows(ORIGINAL, delta)
+
+    assert list(merged.itertuples(index=False, name=None)) == list(target_frame([
+        (1, 'Ann', '2026-01-05', 7.0),
+        (1, 'Ann', '2026-01-06', 7.0),
+        (1, 'Ann', '2026-01-07', 7.0),
+        (2, 'Bob', '2026-01-05', 6.0),
+        (2, 'Bob', '2026-01-06', 4.0),
+    ]).itertuples(index=False, name=None))
+
+
+def test_upsert_target_rows_with_empty_delta():
+    assert ops.upsert_target_rows(ORIGINAL, ORIGINAL.iloc[0:0]) is ORIGINAL
+
+
+def test_target_frame_stats():
+    stats = ops.target_frame_stats(ORIGINAL.iloc[:3])
+
+    day = 24 * 60 * 60
+    jan_5 = int(pd.Timestamp('2026-01-05').timestamp())
+    assert stats.loc[1].tolist() == [2, 2 * jan_5 + day]
+    assert stats.loc[2].tolist() == [1, jan_5]
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from target_schedule import expand_schedule, weekday_numbers  # noqa: E402
+
+
+def test_weekday_numbers():
+    dates = np.array(['2026-01-05', '2026-01-11'], dtype='datetime64[D]')  # Monday, Sunday
+    assert weekday_numbers(dates).tolist() == [0, 6]
+
+
+def test_expand_schedule_with_shared_weekday_hours():
+    # 2026-01-05 is a Monday; the 7th is a holiday
+    grid = expand_schedule(
+        date(2026, 1, 5), date(2026, 1, 11), {'Monday': 7, 'Wednesday': 6.5, 'Saturday': 0},
+        {date(2026, 1, 7)}, [10, 20],
+    )
+
+    assert len(grid) == 4
+    assert grid.practitioner_ids.tolist() == [10, 10, 20, 20]
+    assert grid.target_dates.astype(str).tolist() == ['2026-01-05', '2026-01-10', '2026-01-05', '2026-01-10']
+    assert grid.target_hours.tolist() == [7.0, 0.0, 7.0, 0.0]
+    # One skipped holiday per practitioner that had a target on it
+    assert grid.holidays_skipped.astype(str).tolist() == ['2026-01-07', '2026-01-07']
+
+
+def test_expand_schedule_with_per_practitioner_hours():
+    nan = np.nan
+    hours = [
+        [8, nan, nan, nan, nan, nan, nan],
+        [nan, 4, nan, nan, nan, nan, nan],
+    ]
+    grid = expand_schedule(date(2026, 1, 5), date(2026, 1, 13), hours, set(), ['1', '2'])
+
+    assert grid.practitioner_index.tolist() == [0, 0, 1, 1]
+    assert grid.target_dates.astype(str).tolist() == ['2026-01-05', '2026-01-12', '2026-01-06', '2026-01-13']
+    assert grid.target_hours.tolist() == [8.0, 8.0, 4.0, 4.0]
+    assert len(grid.holidays_skipped) == 0
+
+
+def test_expand_schedule_rejects_wrong_matrix_shape():
+    with pytest.raises(ValueError, match=r"\(2, 7\)"):
+        expand_schedule(date(2026, 1, 5), date(2026, 1, 11), [[7] * 7], set(), [1, 2])